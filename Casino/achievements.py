@@ -0,0 +1,79 @@
+from collections import defaultdict, namedtuple
+
+from django.db.models import F
+
+from .models import Achievement, Player
+
+AchievementRule = namedtuple('AchievementRule', ['bit', 'name', 'description', 'event', 'fact', 'minimum', 'maximum'])
+
+# Each rule unlocks an achievement when an event's fact lies in [minimum, maximum). A rule's
+# bit is its position in Player.achievement_bits; bits are never reused or renumbered. Spin
+# rules apply on every machine, so their thresholds must be reachable on each: a spin pays at
+# most its machine's top symbol value times the stake, 14 on the classic machine.
+ACHIEVEMENT_RULES = (
+    AchievementRule(0, 'VIP Achievement',
+                    "You've paid between $10,000 and $99,999 at once and unlocked the VIP achievement!",
+                    'deposit', 'amount', 10000, 100000),
+    AchievementRule(1, 'SUPERVIP Achievement',
+                    "Congratulations! You've paid $100,000 or more at once and unlocked the SUPERVIP achievement!",
+                    'deposit', 'amount', 100000, None),
+    AchievementRule(2, 'First Spin', 'You played your first spin!', 'spin', 'spin_count', 1, None),
+    AchievementRule(3, 'Regular', "You've played 100 spins!", 'spin', 'spin_count', 100, None),
+    AchievementRule(4, 'Veteran', "You've played 10,000 spins!", 'spin', 'spin_count', 10000, None),
+    AchievementRule(5, 'Hot Streak', 'You won 3 spins in a row!', 'spin', 'win_streak', 3, None),
+    AchievementRule(6, 'On Fire', 'You won 5 spins in a row!', 'spin', 'win_streak', 5, None),
+    AchievementRule(7, 'Big Win', 'You won 10 times your stake in one spin!', 'spin', 'multiplier', 10, None),
+    AchievementRule(8, 'Jackpot', 'You won $10,000 or more in one spin!', 'spin', 'win', 10000, None),
+)
+
+_rules_by_event = defaultdict(list)
+for _rule in ACHIEVEMENT_RULES:
+    _rules_by_event[_rule.event].append(_rule)
+
+
+def achievement_bit(rule):
+    return 1 << rule.bit
+
+
+def _matches(rule, facts):
+    value = facts[rule.fact]
+    return rule.minimum <= value and (rule.maximum is None or value < rule.maximum)
+
+
+def unlock_achievements(player, event, **facts):
+    """
+    Evaluates the rules of ``event`` against ``facts`` and unlocks those that match, returning
+    the rules unlocked.
+
+    Rules whose bit is already set in the player's ``achievement_bits``, loaded with the player
+    row, are skipped, so an event that unlocks nothing costs no query. New achievements are
+    inserted in one statement that skips rows a concurrent event already created, and their
+    bits are OR-ed into the column in another.
+    """
+    unlocked = player.achievement_bits
+    rules = [
+        rule for rule in _rules_by_event[event]
+        if not unlocked & achievement_bit(rule) and _matches(rule, facts)
+    ]
+    if not rules:
+        return rules
+
+    Achievement.objects.bulk_create(
+        [Achievement(player_id=player.pk, name=rule.name, description=rule.description) for rule in rules],
+        ignore_conflicts=True,
+    )
+    bits = sum(achievement_bit(rule) for rule in rules)
+    Player.objects.filter(pk=player.pk).update(achievement_bits=F('achievement_bits').bitor(bits))
+    player.achievement_bits |= bits
+    return rules
+
+
+def unlock_spin_achievements(player, stake, win):
+    """Evaluates the spin rules after ``settle_spin`` has updated the player's counters."""
+    return unlock_achievements(
+        player, 'spin',
+        spin_count=player.spin_count,
+        win_streak=player.win_streak,
+        win=win,
+        multiplier=win / stake if stake else 0,
+    )
@@ -0,0 +1,123 @@
+import base64
+import heapq
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+
+from django.db.models import Q
+
+from .models import Achievement, Bet, Deposit, GameResult
+from .pagination import NEXT, PAGE_SIZE, PREVIOUS, InvalidCursor, Page, seek
+
+FeedSource = namedtuple('FeedSource', ['kind', 'rank', 'model', 'date_field', 'detail_field', 'filters'])
+ActivityItem = namedtuple('ActivityItem', ['timestamp', 'rank', 'pk', 'kind', 'detail'])
+
+# The histories merged into the activity feed. Items are ordered by (timestamp, rank, id), so
+# a spin's win, sharing its timestamp with the bet, comes out just above it.
+FEED_SOURCES = (
+    FeedSource('deposit', 0, Deposit, 'deposit_date', 'amount', {}),
+    FeedSource('bet', 1, Bet, 'bet_date', 'amount', {}),
+    FeedSource('win', 2, GameResult, 'created_at', 'winnings', {'winnings__gt': 0}),
+    FeedSource('achievement', 3, Achievement, 'unlocked_date', 'name', {}),
+)
+
+_item_key = attrgetter('timestamp', 'rank', 'pk')
+
+
+def encode_feed_cursor(direction, item):
+    """Returns the URL-safe page token pointing past ``item`` in the feed."""
+    token = f'{direction}|{item.timestamp.isoformat()}|{item.rank}|{item.pk}'
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+
+def decode_feed_cursor(token):
+    """Returns the direction, timestamp, rank and id of a feed page token."""
+    try:
+        direction, timestamp, rank, pk = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split('|')
+        if direction not in (NEXT, PREVIOUS):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(timestamp), int(rank), int(pk)
+    except ValueError as error:
+        raise InvalidCursor(f'Invalid page token {token!r}.') from error
+
+
+def _seek(source, direction, timestamp, rank, pk):
+    """
+    Returns the filter keeping the rows of ``source`` past ``(timestamp, rank, pk)`` in the feed
+    order: older rows going forward, newer ones going back.
+    """
+    date_field = source.date_field
+    if source.rank == rank:
+        return seek(date_field, direction, timestamp, pk)
+    past = 'lt' if direction == NEXT else 'gt'
+    # Rows of another source sharing the timestamp are past the cursor when their rank is.
+    if (source.rank < rank) == (direction == NEXT):
+        past += 'e'
+    return Q(**{f'{date_field}__{past}': timestamp})
+
+
+def _items(source, rows):
+    for timestamp, pk, detail in rows:
+        yield ActivityItem(timestamp, source.rank, pk, source.kind, detail)
+
+
+class ActivityFeed:
+    """
+    Newest-first feed of a player's deposits, bets, wins and achievements.
+
+    Each page reads at most ``page_size + 1`` rows from every source, seeking past the cursor
+    on its ``(player, date, id)`` index, and k-way merges the four ordered lists with
+    ``heapq.merge`` until ``page_size + 1`` items are out. A page thus costs four small
+    indexed reads however long the histories are; the cursor is the ``(timestamp, rank, id)``
+    of the item it points past, which fixes each source's position at once.
+    """
+
+    def __init__(self, player, page_size=PAGE_SIZE, sources=FEED_SOURCES):
+        self.player = player
+        self.page_size = page_size
+        self.sources = sources
+
+    def query(self, token=None):
+        """Returns the direction of the page and the queryset of every source, ignoring invalid tokens."""
+        try:
+            direction, *position = decode_feed_cursor(token) if token else (None,)
+        except InvalidCursor:
+            direction = None
+
+        querysets = []
+        for source in self.sources:
+            queryset = source.model.objects.filter(player=self.player, **source.filters)
+            if direction is not None:
+                queryset = queryset.filter(_seek(source, direction, *position))
+            prefix = '' if direction == PREVIOUS else '-'
+            queryset = queryset.order_by(f'{prefix}{source.date_field}', f'{prefix}pk')
+            querysets.append(queryset.values_list(source.date_field, 'pk', source.detail_field)[:self.page_size + 1])
+        return direction, querysets
+
+    def page(self, direction, rows):
+        """Returns the Page merged from the rows ``query``'s querysets returned, one list per source."""
+        streams = [_items(source, source_rows) for source, source_rows in zip(self.sources, rows)]
+        merged = heapq.merge(*streams, key=_item_key, reverse=direction != PREVIOUS)
+        items = list(islice(merged, self.page_size + 1))
+        more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if direction == PREVIOUS:
+            items.reverse()
+            has_newer, has_older = more, True
+        else:
+            has_newer, has_older = direction == NEXT, more
+
+        return Page(
+            items,
+            encode_feed_cursor(NEXT, items[-1]) if has_older and items else None,
+            encode_feed_cursor(PREVIOUS, items[0]) if has_newer and items else None,
+        )
+
+    def get_page(self, token=None):
+        direction, querysets = self.query(token)
+        return self.page(direction, [list(queryset) for queryset in querysets])
+
+    async def aget_page(self, token=None):
+        direction, querysets = self.query(token)
+        return self.page(direction, [[row async for row in queryset] for queryset in querysets])
@@ -0,0 +1,120 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render
+from django.utils.decorators import method_decorator
+
+from .activity import ActivityFeed
+from .idempotency import idempotent
+from .machines import DEFAULT_MACHINE
+from .models import Achievement, Bet, Deposit, GameResult
+from .pagination import KeysetPaginator
+from .views import SlotMachineGameView
+
+
+async def load_user(request):
+    """
+    Resolves the lazy ``request.user`` in a worker thread and replaces it with the user, so
+    views and templates can use it on the event loop.
+    """
+    request.user = await sync_to_async(get_user)(request)
+    return request.user
+
+
+def async_login_required(view):
+    """Async counterpart of ``login_required`` for function views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await load_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+class AsyncSlotMachineGameView(SlotMachineGameView):
+    """
+    Slot machine games for ASGI deployments.
+
+    The spin and its wallet settlement run in one ``sync_to_async`` call, as Django transactions
+    cannot be used from async code; the page itself is rendered on the event loop.
+    """
+
+    async def get(self, request, machine_id=DEFAULT_MACHINE):
+        machine = self.get_machine(machine_id)
+        user = await load_user(request)
+        balance = user.balance if user.is_authenticated else 0
+
+        context = self.get_context(
+            machine,
+            balance=balance,
+            bet=10,
+            lines=1,
+            message='',
+            winning_lines=[],
+        )
+        return render(request, self.template_name, context)
+
+    @method_decorator(idempotent)
+    async def post(self, request, machine_id=DEFAULT_MACHINE):
+        machine = self.get_machine(machine_id)
+        await load_user(request)
+        try:
+            bet, lines = self.parse_bet(request)
+        except ValueError:
+            return self.render_invalid_bet(request, machine)
+        outcome = await sync_to_async(self.play)(request, machine, bet, lines)
+
+        context = self.get_context(
+            machine,
+            balance=outcome.balance,
+            bet=bet,
+            lines=lines,
+            message=outcome.message,
+            winning_lines=outcome.winning_lines,
+            show_winning_lines=outcome.winnings > 0,
+        )
+
+        return render(request, self.template_name, context)
+
+
+@async_login_required
+async def deposit_history(request):
+    """Async view for displaying deposit history of the logged-in player."""
+    paginator = KeysetPaginator(Deposit.objects.filter(player=request.user), 'deposit_date')
+    page = await paginator.aget_page(request.GET.get('cursor'))
+    return render(request, 'deposit_history.html', {'deposits': page.items, 'page': page})
+
+
+@async_login_required
+async def bet_history(request):
+    """Async view for displaying bet history of the logged-in player."""
+    paginator = KeysetPaginator(Bet.objects.filter(player=request.user), 'bet_date')
+    page = await paginator.aget_page(request.GET.get('cursor'))
+    return render(request, 'bet_history.html', {'bets': page.items, 'page': page})
+
+
+@async_login_required
+async def winnings_history(request):
+    """Async view for displaying winnings history of the logged-in player."""
+    paginator = KeysetPaginator(GameResult.objects.filter(player=request.user, winnings__gt=0), 'created_at')
+    page = await paginator.aget_page(request.GET.get('cursor'))
+    return render(request, 'winnings_history.html', {'winnings': page.items, 'page': page})
+
+
+@async_login_required
+async def activity(request):
+    """Async view for displaying the activity feed of the logged-in player."""
+    page = await ActivityFeed(request.user).aget_page(request.GET.get('cursor'))
+    return render(request, 'activity.html', {'activity': page.items, 'page': page})
+
+
+@async_login_required
+async def achievements(request):
+    """Async view for displaying the achievements of the logged-in player."""
+    player_achievements = [
+        achievement async for achievement in Achievement.objects.filter(player=request.user).order_by('-unlocked_date')
+    ]
+    return render(request, 'achievements.html', {'player_achievements': player_achievements})
@@ -0,0 +1,44 @@
+MAX_CODE_BITS = 63
+
+
+class GridCodec:
+    """
+    Packs a spin grid into a single integer for ``GameResult.spin_code``.
+
+    Symbols are stored as their index in the machine's symbol alphabet using the fewest bits
+    that fit the alphabet, cell by cell in column-major order starting from the lowest bits.
+    The whole grid must fit a signed 64-bit column, e.g. a 5x3 grid of up to 16 symbols.
+    """
+
+    def __init__(self, symbols, rows, cols):
+        self.symbols = tuple(symbols)
+        self.rows = rows
+        self.cols = cols
+        self.bits = max(1, (len(self.symbols) - 1).bit_length())
+        if self.bits * rows * cols > MAX_CODE_BITS:
+            raise ValueError(f'A {cols}x{rows} grid of {len(self.symbols)} symbols does not fit {MAX_CODE_BITS} bits.')
+        self._codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        self._mask = (1 << self.bits) - 1
+
+    def encode(self, columns):
+        """Returns the packed integer of a grid given as columns of symbols."""
+        codes = self._codes
+        bits = self.bits
+        packed = 0
+        shift = 0
+        for column in columns:
+            for symbol in column:
+                packed |= codes[symbol] << shift
+                shift += bits
+        return packed
+
+    def decode(self, packed):
+        """Returns the grid of a packed integer as columns of symbols."""
+        symbols = self.symbols
+        bits = self.bits
+        mask = self._mask
+        rows = self.rows
+        return [
+            [symbols[packed >> (col * rows + row) * bits & mask] for row in range(rows)]
+            for col in range(self.cols)
+        ]
@@ -0,0 +1,119 @@
+import csv
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .machines import get_machine
+from .models import Bet, Deposit, GameResult
+
+EXPORT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+Export = namedtuple('Export', ['model', 'date_field', 'fields'])
+
+EXPORTS = {
+    'deposits': Export(Deposit, 'deposit_date', ('id', 'player', 'deposit_date', 'amount')),
+    'bets': Export(Bet, 'bet_date', ('id', 'player', 'bet_date', 'amount')),
+    'spins': Export(GameResult, 'created_at', (
+        'id', 'player', 'created_at', 'machine', 'machine_version', 'stake', 'winnings', 'lines', 'bet_per_line',
+        'server_seed', 'nonce', 'spin_code', 'spin_results',
+    )),
+}
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes, so rows can be yielded one by one."""
+
+    def write(self, value):
+        return value
+
+
+def _spin_rows(rows):
+    """Replaces the packed spin_code and legacy spin_results of spin rows with the decoded grid."""
+    machine_index = EXPORTS['spins'].fields.index('machine')
+    for row in rows:
+        machine_id, version, spin_code, grid = row[machine_index], row[machine_index + 1], row[-2], row[-1]
+        if spin_code is not None:
+            try:
+                grid = get_machine(machine_id, version).codec.decode(spin_code)
+            except KeyError:
+                pass
+        yield row[:-2] + (grid,)
+
+
+def export_columns(kind):
+    """Returns the column names of an export."""
+    fields = EXPORTS[kind].fields
+    if kind == 'spins':
+        return fields[:-2] + ('grid',)
+    return fields
+
+
+def export_queryset(kind, player=None):
+    """
+    Returns the queryset of an export's rows. A player's rows come in ``(date, id)`` order,
+    read straight off the ``(player, date, id)`` index; all players' rows in id order, off
+    the primary key.
+    """
+    export = EXPORTS[kind]
+    if player is None:
+        queryset = export.model.objects.order_by('pk')
+    else:
+        queryset = export.model.objects.filter(player=player).order_by(export.date_field, 'pk')
+    return queryset.values_list(*export.fields)
+
+
+def export_rows(kind, player=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the rows of an export as tuples, streamed from the database ``chunk_size`` rows
+    at a time (with a server-side cursor on PostgreSQL).
+    """
+    rows = export_queryset(kind, player).iterator(chunk_size=chunk_size)
+    return _spin_rows(rows) if kind == 'spins' else rows
+
+
+def export_blocks(lines, size=BUFFER_SIZE):
+    """
+    Joins the lines of an export into blocks of about ``size`` characters for streaming
+    responses. The first line is sent on its own so the download starts at once.
+    """
+    lines = iter(lines)
+    for line in lines:
+        yield line
+        break
+    block = []
+    length = 0
+    for line in lines:
+        block.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(block)
+            block = []
+            length = 0
+    if block:
+        yield ''.join(block)
+
+
+def export_lines(kind, fmt, player=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields an export encoded as CSV (with a header line) or JSON Lines, one line at a time,
+    so it can be streamed at constant memory whatever its length. In CSV, grids are written
+    as their columns separated by ``|``.
+    """
+    columns = export_columns(kind)
+    rows = export_rows(kind, player, chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(
+                ['|'.join(''.join(column) for column in value) if isinstance(value, list) else value for value in row]
+            )
+    else:
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(dict(zip(columns, row))) + '\n'
@@ -0,0 +1,183 @@
+import hashlib
+import hmac
+import secrets
+import struct
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .machines import get_machine
+from .models import GameResult, Player, ServerSeed
+
+SEED_CACHE_SIZE = 10000
+VERIFY_CHUNK_SIZE = 2000
+
+VerificationResult = namedtuple('VerificationResult', ['checked', 'mismatches', 'invalid_seeds'])
+
+_seeds = OrderedDict()
+_seeds_lock = threading.Lock()
+
+
+def hash_seed(seed):
+    """Returns the public commitment to a hex-encoded server seed."""
+    return hashlib.sha256(bytes.fromhex(seed)).hexdigest()
+
+
+def keyed_hmac(seed):
+    """Returns an HMAC-SHA256 object keyed with a hex-encoded server seed, ready to be copied per message."""
+    return hmac.new(bytes.fromhex(seed), digestmod=hashlib.sha256)
+
+
+class FairRandom:
+    """
+    Deterministic draw stream of one provably-fair spin.
+
+    Words are the big-endian 64-bit chunks of ``HMAC-SHA256(server_seed, "client_seed:nonce:round")``
+    for rounds 0, 1, 2, ... and ``randrange(n)`` rejects words at or above the largest multiple
+    of ``n`` below 2**64 before reducing them modulo ``n``. Anyone holding the revealed server
+    seed can replay the stream and the spin built from it.
+    """
+
+    def __init__(self, keyed, client_seed, nonce):
+        self._keyed = keyed
+        self._prefix = f'{client_seed}:{nonce}:'.encode()
+        self._round = 0
+        self._words = []
+
+    def _next_word(self):
+        if not self._words:
+            mac = self._keyed.copy()
+            mac.update(self._prefix + str(self._round).encode())
+            self._round += 1
+            self._words = list(struct.unpack('>4Q', mac.digest()))
+            self._words.reverse()
+        return self._words.pop()
+
+    def randrange(self, n):
+        if not 0 < n <= 1 << 64:
+            raise ValueError(f'FairRandom cannot draw below {n}.')
+        limit = (1 << 64) - (1 << 64) % n
+        while True:
+            word = self._next_word()
+            if word < limit:
+                return word % n
+
+
+class ActiveSeed:
+    """In-process copy of a player's unrevealed server seed with its pre-keyed HMAC."""
+
+    def __init__(self, server_seed):
+        self.id = server_seed.pk
+        self.seed_hash = server_seed.seed_hash
+        self.client_seed = server_seed.client_seed
+        self.keyed = keyed_hmac(server_seed.seed)
+
+    def rng(self, nonce):
+        return FairRandom(self.keyed, self.client_seed, nonce)
+
+
+def _cache_seed(server_seed):
+    seed = ActiveSeed(server_seed)
+    with _seeds_lock:
+        _seeds[seed.id] = seed
+        if len(_seeds) > SEED_CACHE_SIZE:
+            _seeds.popitem(last=False)
+    return seed
+
+
+def create_seed(player, client_seed=None):
+    """Creates and activates a new server seed for a player, resetting the nonce."""
+    seed = secrets.token_hex(32)
+    server_seed = ServerSeed.objects.create(
+        player=player,
+        seed=seed,
+        seed_hash=hash_seed(seed),
+        client_seed=client_seed or secrets.token_hex(8),
+    )
+    player.active_seed = server_seed
+    player.nonce = 0
+    Player.objects.filter(pk=player.pk).update(active_seed=server_seed, nonce=0)
+    return server_seed
+
+
+def get_active_seed(player):
+    """
+    Returns the ActiveSeed for a player's current server seed, creating one on first use.
+
+    Server seeds never change once created and rotation activates a new row, so seeds are
+    cached by id for the life of the process and a spin costs no extra query.
+    """
+    if player.active_seed_id is None:
+        return _cache_seed(create_seed(player))
+    with _seeds_lock:
+        seed = _seeds.get(player.active_seed_id)
+        if seed is not None:
+            _seeds.move_to_end(seed.id)
+            return seed
+    return _cache_seed(ServerSeed.objects.get(pk=player.active_seed_id))
+
+
+@transaction.atomic
+def rotate_seed(player, client_seed=None):
+    """Reveals the player's current server seed and activates a new one, returning the revealed seed."""
+    revealed = None
+    if player.active_seed_id is not None:
+        revealed = ServerSeed.objects.get(pk=player.active_seed_id)
+        revealed.revealed_at = timezone.now()
+        revealed.save(update_fields=['revealed_at'])
+    create_seed(player, client_seed)
+    return revealed
+
+
+def replay_spin(machine_id, keyed, client_seed, nonce, version=None):
+    """
+    Rebuilds the grid of a provably-fair spin from its seeds and nonce, with the version of the
+    machine that drew it (the current one by default).
+    """
+    return get_machine(machine_id, version).spin(FairRandom(keyed, client_seed, nonce))
+
+
+def verify_history(player, chunk_size=VERIFY_CHUNK_SIZE):
+    """
+    Replays every spin of a player made with an already revealed server seed, each with the
+    machine version that drew it.
+
+    Rows are streamed with a server-side cursor in seed and nonce order, each seed is checked
+    against its commitment and keyed once, and every spin costs one HMAC per four draws.
+    Returns the number of spins checked, the ids of spins whose stored grid differs from the
+    replayed one, and the ids of revealed seeds that do not match their hash.
+    """
+    seeds = {
+        server_seed.pk: server_seed
+        for server_seed in ServerSeed.objects.filter(player=player, revealed_at__isnull=False)
+    }
+    invalid_seeds = [pk for pk, server_seed in seeds.items() if hash_seed(server_seed.seed) != server_seed.seed_hash]
+
+    rows = GameResult.objects.filter(
+        player=player, server_seed__in=list(seeds),
+    ).order_by('server_seed', 'nonce').values_list(
+        'pk', 'server_seed', 'nonce', 'machine', 'machine_version', 'spin_code', 'spin_results',
+    ).iterator(chunk_size=chunk_size)
+
+    checked = 0
+    mismatches = []
+    current, keyed = None, None
+    for pk, seed_id, nonce, machine_id, version, spin_code, spin_results in rows:
+        if seed_id != current:
+            current, keyed = seed_id, keyed_hmac(seeds[seed_id].seed)
+        checked += 1
+        try:
+            machine = get_machine(machine_id, version)
+        except KeyError:
+            mismatches.append(pk)
+            continue
+        replayed = machine.spin(FairRandom(keyed, seeds[seed_id].client_seed, nonce))
+        if spin_code is not None:
+            matches = machine.codec.encode(replayed) == spin_code
+        else:
+            matches = replayed == spin_results
+        if not matches:
+            mismatches.append(pk)
+    return VerificationResult(checked, mismatches, invalid_seeds)
@@ -0,0 +1,311 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import weakref
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import GameResult
+
+BATCH_SIZE = 500
+QUEUE_SIZE = 10000
+FLUSH_INTERVAL = 0.2
+PUT_TIMEOUT = 0.05
+RETRY_DELAY = 1.0
+SPOOL_PATTERN = 'history-*.jsonl'
+
+logger = logging.getLogger(__name__)
+
+_writers = weakref.WeakSet()
+
+
+def _load_row(line):
+    fields = GameResult._meta
+    return {name: fields.get_field(name).to_python(value) for name, value in json.loads(line).items()}
+
+
+def insert_rows(rows, batch_size=BATCH_SIZE):
+    """
+    Inserts GameResult rows given as dicts of field values in multi-row INSERTs.
+
+    Spins already in the table, by server seed and nonce, are skipped so a batch can be
+    written again after a crash or a failed flush.
+    """
+    GameResult.objects.bulk_create(
+        [GameResult(**row) for row in rows], batch_size=batch_size, ignore_conflicts=True,
+    )
+
+
+class SpoolSegment:
+    """
+    One spool file of a HistoryWriter, holding up to a batch of rows and locked by its writer.
+
+    The file is created under a hidden name, locked and only then renamed into the spool
+    directory, so ``recover_spool`` never claims a segment whose writer is alive. Rows are
+    flushed to the OS as they are written, which survives the process crashing; with ``fsync``
+    they are also forced to disk, as is the segment's directory entry, which survives the
+    machine crashing at the cost of a disk sync per spin.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.rows = 0
+        self.pending = 0
+        creating = path.with_name(f'.{path.name}.tmp')
+        self.file = open(creating, 'x', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        os.replace(creating, path)
+        if fsync:
+            directory = os.open(path.parent, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def write(self, line):
+        self.file.write(line)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.rows += 1
+        self.pending += 1
+
+    def remove(self):
+        """Deletes the segment once all of its rows are in the table, releasing its lock last."""
+        self.path.unlink(missing_ok=True)
+        self.file.close()
+
+
+class HistoryWriter:
+    """
+    Write-behind buffer of spin history rows.
+
+    ``record`` appends a row to the process's current spool segment and puts it on a bounded
+    queue; a flusher thread drains the queue into batches of up to ``batch_size`` rows, waiting
+    at most ``flush_interval`` seconds to fill one, and inserts them with ``insert_rows``. A new
+    segment is started every ``batch_size`` rows and deleted once all of its rows are written,
+    so under steady load the spool holds about the rows in the queue, and after a crash exactly
+    the rows that may be missing, which ``recover_spool`` replays. When the queue stays full for
+    ``put_timeout`` seconds the row is inserted on the caller's thread instead, slowing requests
+    down to the database's pace rather than growing the buffer.
+
+    The spool survives the process crashing. Rows recorded within about ``flush_interval``
+    seconds of an OS crash or power loss are only safe with ``fsync``, which syncs every
+    row to disk before ``record`` returns.
+    """
+
+    def __init__(self, spool_dir, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE,
+                 flush_interval=FLUSH_INTERVAL, put_timeout=PUT_TIMEOUT, fsync=False):
+        self.spool_dir = Path(spool_dir)
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._reset()
+        _writers.add(self)
+
+    def _reset(self):
+        self._queue = queue.Queue(self.queue_size)
+        self._lock = threading.Condition()
+        self._pending = 0
+        self._segment = None
+        # Segment names are unique per writer, so a recycled pid never appends to the spool of
+        # a process that crashed before it was recovered.
+        self._name = f'history-{os.getpid()}-{uuid.uuid4().hex[:12]}'
+        self._sequence = itertools.count()
+        self._flusher = None
+
+    def spool_paths(self):
+        """Returns the paths of the segments holding rows not written yet."""
+        with self._lock:
+            return sorted(self.spool_dir.glob(f'{self._name}-*.jsonl'))
+
+    def _open_segment(self):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        return SpoolSegment(self.spool_dir / f'{self._name}-{next(self._sequence)}.jsonl', self.fsync)
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._run, name='history-flusher', daemon=True)
+        self._flusher.start()
+
+    def record(self, row):
+        """Buffers one GameResult row given as a dict of field values."""
+        line = json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+        with self._lock:
+            segment = self._segment
+            if segment is None or segment.rows >= self.batch_size:
+                segment = self._segment = self._open_segment()
+            segment.write(line)
+            self._pending += 1
+            if self._flusher is None:
+                self._start_flusher()
+        item = (segment, row)
+        try:
+            self._queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            try:
+                insert_rows([row], self.batch_size)
+            except DatabaseError:
+                self._queue.put(item)
+            else:
+                self._written([segment])
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, items):
+        rows = [row for _, row in items]
+        while True:
+            try:
+                insert_rows(rows, self.batch_size)
+                break
+            except DatabaseError:
+                logger.exception('Could not write %d spin history rows, retrying.', len(rows))
+                connection.close()
+                time.sleep(RETRY_DELAY)
+        self._written([segment for segment, _ in items])
+
+    def _written(self, segments):
+        with self._lock:
+            for segment in segments:
+                segment.pending -= 1
+                if not segment.pending:
+                    segment.remove()
+                    if segment is self._segment:
+                        self._segment = None
+            self._pending -= len(segments)
+            if not self._pending:
+                self._lock.notify_all()
+
+    def flush(self, timeout=None):
+        """Waits until every buffered row is written, returning False on timeout."""
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._pending, timeout)
+
+
+def _reset_after_fork():
+    for writer in list(_writers):
+        writer._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def write_behind_enabled():
+    return getattr(settings, 'CASINO_HISTORY_WRITE_BEHIND', False)
+
+
+def spool_dir():
+    return getattr(settings, 'CASINO_HISTORY_SPOOL_DIR', Path(settings.BASE_DIR) / 'spool')
+
+
+@lru_cache(maxsize=None)
+def get_writer():
+    return HistoryWriter(
+        spool_dir(),
+        batch_size=getattr(settings, 'CASINO_HISTORY_BATCH_SIZE', BATCH_SIZE),
+        queue_size=getattr(settings, 'CASINO_HISTORY_QUEUE_SIZE', QUEUE_SIZE),
+        fsync=getattr(settings, 'CASINO_HISTORY_FSYNC', False),
+    )
+
+
+def record_spin(**fields):
+    """
+    Records the GameResult of a spin.
+
+    Without ``CASINO_HISTORY_WRITE_BEHIND`` the row is inserted right away. With it, the row is
+    handed to the write-behind buffer once the surrounding transaction commits, so the spin's
+    balance update is the only statement on the request path.
+    """
+    if not write_behind_enabled():
+        return GameResult.objects.create(**fields)
+    fields.setdefault('created_at', timezone.now())
+    transaction.on_commit(lambda: get_writer().record(fields))
+
+
+def _claim(path):
+    """
+    Opens a spool segment for recovery, locked, or returns None when its writer is still alive
+    (or, without ``fcntl``, when it belongs to this process) or another recovery claimed it.
+    """
+    try:
+        spool = path.open(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+    if fcntl is None:
+        if path.name.startswith(f'history-{os.getpid()}-'):
+            spool.close()
+            return None
+        return spool
+    try:
+        fcntl.flock(spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if os.fstat(spool.fileno()).st_ino == path.stat().st_ino:
+            return spool
+    except (BlockingIOError, FileNotFoundError):
+        pass
+    spool.close()
+    return None
+
+
+def spool_paths(directory=None):
+    """Returns the spool segments of every process, live or stopped, holding rows that may not be written yet."""
+    return sorted(Path(directory or spool_dir()).glob(SPOOL_PATTERN))
+
+
+def recover_spool(directory=None, batch_size=BATCH_SIZE):
+    """
+    Inserts the rows left in the spool segments of stopped processes and removes the files,
+    returning the number of rows read. Segments locked by a live writer are left alone and rows
+    that were written before the crash are skipped.
+    """
+    recovered = 0
+    for path in spool_paths(directory):
+        spool = _claim(path)
+        if spool is None:
+            continue
+        with spool:
+            rows = []
+            for line in spool:
+                try:
+                    rows.append(_load_row(line))
+                except (ValueError, ValidationError):
+                    logger.warning('Skipping a torn line in %s.', path)
+                if len(rows) >= batch_size:
+                    insert_rows(rows, batch_size)
+                    recovered += len(rows)
+                    rows = []
+            insert_rows(rows, batch_size)
+            recovered += len(rows)
+            path.unlink()
+    return recovered
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+KEY_TTL = timedelta(hours=24)
+RESERVATION_LEASE = timedelta(seconds=30)
+FORM_CONTENT_TYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+UNSIGNED_FIELDS = (FIELD, 'csrfmiddlewaretoken')
+CACHE_SIZE = 10000
+TAKEN_OVER = 'A retry of this request is in progress.'
+
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+
+class ReservationLost(Exception):
+    """Raised by ``settle`` when the request's reservation expired and a retry took it over."""
+
+
+def new_key():
+    """Returns a fresh idempotency key for a form."""
+    return uuid.uuid4().hex
+
+
+def _cache(player_id, stored):
+    with _responses_lock:
+        _responses[player_id, stored.key] = stored
+        if len(_responses) > CACHE_SIZE:
+            _responses.popitem(last=False)
+
+
+def _cached(player_id, key):
+    with _responses_lock:
+        stored = _responses.get((player_id, key))
+        if stored is not None:
+            _responses.move_to_end((player_id, key))
+    return stored
+
+
+def _replay(stored):
+    response = HttpResponse(bytes(stored.content), status=stored.status_code, content_type=stored.content_type)
+    if stored.location:
+        response['Location'] = stored.location
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def fingerprint(request):
+    """
+    Returns a SHA-256 hash of the parameters of a request. Form fields are hashed by name and
+    value, leaving out the idempotency key and CSRF token, so the same form submitted urlencoded
+    or as multipart hashes alike; other bodies are hashed as they are.
+    """
+    if request.content_type in FORM_CONTENT_TYPES:
+        fields = sorted((name, values) for name, values in request.POST.lists() if name not in UNSIGNED_FIELDS)
+        content = json.dumps(fields).encode()
+    else:
+        content = request.body
+    return hashlib.sha256(content).hexdigest()
+
+
+def _lookup(player_id, key):
+    stored = _cached(player_id, key)
+    if stored is None:
+        stored = IdempotencyKey.objects.filter(player_id=player_id, key=key).first()
+        if stored is not None and stored.status_code is not None:
+            _cache(player_id, stored)
+    if stored is None:
+        return None
+    ttl = KEY_TTL if stored.status_code is not None or stored.settled else RESERVATION_LEASE
+    if stored.created_at < timezone.now() - ttl:
+        # A reservation settled meanwhile is kept: its spin or deposit was made.
+        IdempotencyKey.objects.filter(pk=stored.pk, created_at=stored.created_at, settled=stored.settled).delete()
+        with _responses_lock:
+            _responses.pop((player_id, key), None)
+        return None
+    return stored
+
+
+def _reserve(player_id, key, signature):
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(player_id=player_id, key=key, **signature)
+    except IntegrityError:
+        return None
+
+
+def _release(reservation):
+    IdempotencyKey.objects.filter(pk=reservation.pk, status_code__isnull=True, settled=False).delete()
+
+
+def settle(request):
+    """
+    Marks the idempotency key of ``request``, if any, as settled. Called in the transaction that
+    makes the request's spin or deposit, so once that commits retries never run the view again,
+    even when the response is lost. Raises ReservationLost, rolling the transaction back, when
+    the reservation outlived its lease and was taken over by a retry.
+    """
+    reservation = getattr(request, 'idempotency_reservation', None)
+    if reservation is None:
+        return
+    if not IdempotencyKey.objects.filter(pk=reservation.pk, status_code__isnull=True).update(settled=True):
+        raise ReservationLost(f'Idempotency key {reservation.key!r} was taken over by a retry.')
+    reservation.settled = True
+
+
+def _store(reservation, response):
+    fields = {
+        'status_code': response.status_code,
+        'content_type': response.get('Content-Type', ''),
+        'location': response.get('Location', ''),
+        'content': response.content,
+    }
+    # The reservation may have outlived its lease and been taken over by a retry meanwhile.
+    if IdempotencyKey.objects.filter(pk=reservation.pk, status_code__isnull=True).update(**fields):
+        for name, value in fields.items():
+            setattr(reservation, name, value)
+        _cache(reservation.player_id, reservation)
+
+
+def _claim(request):
+    """
+    Returns ``(reservation, None)`` when the view should run, with the IdempotencyKey reserved
+    for the request or None for requests without a key, or ``(None, response)`` to answer the
+    request without running the view.
+    """
+    key = request.headers.get(HEADER) or request.POST.get(FIELD)
+    if not key or not request.user.is_authenticated:
+        return None, None
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        return None, HttpResponseBadRequest('Idempotency key is too long.')
+
+    player_id = request.user.pk
+    signature = {'method': request.method, 'path': request.path, 'fingerprint': fingerprint(request)}
+    stored = _lookup(player_id, key)
+    if stored is None:
+        reservation = _reserve(player_id, key, signature)
+        if reservation is not None:
+            return reservation, None
+        stored = _lookup(player_id, key)
+
+    if stored is not None and any(getattr(stored, name) != value for name, value in signature.items()):
+        return None, HttpResponse('This idempotency key was used for a different request.', status=422)
+    if stored is not None and stored.status_code is None and stored.settled:
+        return None, HttpResponse('The request with this idempotency key was already made.', status=409)
+    if stored is None or stored.status_code is None:
+        return None, HttpResponse('A request with this idempotency key is still in progress.', status=409)
+    return None, _replay(stored)
+
+
+def _complete(reservation, response):
+    if reservation is None:
+        return
+    if response.status_code >= 500 or response.streaming:
+        _release(reservation)
+    else:
+        if hasattr(response, 'render'):
+            response.render()
+        _store(reservation, response)
+
+
+def idempotent(view):
+    """
+    Makes a view answer retries of a logged-in player's request carrying the same
+    ``Idempotency-Key`` header or ``idempotency_key`` form field with the stored response of
+    the first one, without running the view again.
+
+    The key is reserved with an INSERT before the view runs, together with the method, path and
+    fingerprint of the request; concurrent duplicates get a 409 instead of a second spin or
+    deposit, and a key reused for a different request a 422. Completed responses are kept in
+    the database for ``KEY_TTL`` and recent ones in an in-process LRU. Server errors release the
+    key so the request can be retried, and reservations left by requests that never finished
+    expire after ``RESERVATION_LEASE``, unless the view called ``settle`` in the transaction of
+    its spin or deposit: retries of those get a 409. Works on sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            reservation, response = await sync_to_async(_claim)(request)
+            if response is not None:
+                return response
+            request.idempotency_reservation = reservation
+            try:
+                response = await view(request, *args, **kwargs)
+            except ReservationLost:
+                return HttpResponse(TAKEN_OVER, status=409)
+            except Exception:
+                if reservation is not None:
+                    await sync_to_async(_release)(reservation)
+                raise
+            await sync_to_async(_complete)(reservation, response)
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        reservation, response = _claim(request)
+        if response is not None:
+            return response
+        request.idempotency_reservation = reservation
+        try:
+            response = view(request, *args, **kwargs)
+        except ReservationLost:
+            return HttpResponse(TAKEN_OVER, status=409)
+        except Exception:
+            if reservation is not None:
+                _release(reservation)
+            raise
+        _complete(reservation, response)
+        return response
+    return wrapper
+
+
+def purge_keys(older_than=KEY_TTL):
+    """Deletes the keys older than ``older_than``, returning how many were deleted."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+    with _responses_lock:
+        _responses.clear()
+    return deleted
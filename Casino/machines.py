@@ -0,0 +1,126 @@
+from collections import namedtuple
+from functools import cached_property, lru_cache
+
+from .codec import GridCodec
+from .rtp import analyze_paytable
+from .slots import MAX_BET, MIN_BET, ROWS, COLS, PAYLINES, PAYLINES_5x3, symbol_count, symbol_value, OutcomeTable, \
+    SlotEngine
+
+SlotConfig = namedtuple('SlotConfig', ['id', 'name', 'rows', 'cols', 'symbols', 'values', 'paylines', 'min_bet',
+                                       'max_bet', 'sampler', 'version'])
+
+# Live spin samplers: 'reels' draws symbol by symbol, 'table' picks the whole grid from the outcome CDF.
+# Past spins are replayed with the sampler that drew them, so a sampler that draws differently is a new name.
+SAMPLERS = ('reels', 'table')
+
+DEFAULT_MACHINE = 'classic'
+
+SLOT_MACHINES = {
+    config.id: config for config in (
+        SlotConfig(
+            id='classic',
+            name='Classic 3x3',
+            rows=ROWS,
+            cols=COLS,
+            symbols=symbol_count,
+            values=symbol_value,
+            paylines=PAYLINES,
+            min_bet=MIN_BET,
+            max_bet=MAX_BET,
+            sampler='table',
+            version=1,
+        ),
+        SlotConfig(
+            id='five-reel',
+            name='Five Reel 5x3',
+            rows=3,
+            cols=5,
+            symbols={'$': 3, '!': 5, '#': 8, '@': 12},
+            values={'$': 2500, '!': 500, '#': 120, '@': 40},
+            paylines=PAYLINES_5x3,
+            min_bet=1,
+            max_bet=50,
+            sampler='reels',
+            version=1,
+        ),
+    )
+}
+
+# Configurations replaced by a newer version of their machine, by id and version. Spins record
+# the version they were drawn with, so changing a machine's reels, paylines or sampler means
+# moving its config here unchanged and bumping the version of the live one; past spins then
+# still decode and replay as they were drawn.
+RETIRED_MACHINES = {}
+
+
+class SlotMachine:
+    """
+    A configured slot machine holding its reel model, live spin sampler, compiled paylines, grid
+    codec and exact statistics.
+
+    Instances are built once per process by ``get_machine``; the engine, sampler and codec are
+    created eagerly and the RTP statistics on first access.
+    """
+
+    def __init__(self, config):
+        if config.sampler not in SAMPLERS:
+            raise ValueError(f'Unknown sampler {config.sampler!r} for slot machine {config.id!r}.')
+        self.config = config
+        self.engine = SlotEngine(config.rows, config.cols, config.symbols, config.values, config.paylines)
+        if config.sampler == 'table':
+            self.sampler = OutcomeTable(self.engine.reels, config.rows, config.cols)
+        else:
+            self.sampler = self.engine.reels
+        self.codec = GridCodec(config.symbols, config.rows, config.cols)
+
+    def spin(self, rng):
+        """Draws one live spin with the machine's sampler, as columns of symbols."""
+        config = self.config
+        return self.sampler.spin(config.rows, config.cols, rng)
+
+    def draw(self, n, rng):
+        """Draws ``n`` grids from the same distribution as ``spin``, as an ``(n, cols, rows)`` array of codes."""
+        if isinstance(self.sampler, OutcomeTable):
+            return self.sampler.draw(n, rng)
+        return self.engine.draw(n, rng)
+
+    def spin_batch(self, n, rng=None, lines=None, bet=1):
+        """Generates and evaluates ``n`` spins drawn with the machine's sampler, for simulations."""
+        return self.engine.spin_batch(n, rng, lines, bet, draw=self.draw)
+
+    @property
+    def id(self):
+        return self.config.id
+
+    @property
+    def max_lines(self):
+        return self.engine.max_lines
+
+    @cached_property
+    def stats(self):
+        config = self.config
+        return analyze_paytable(config.rows, config.cols, config.symbols, config.values, config.paylines,
+                                self.max_lines)
+
+
+def get_machine(machine_id=DEFAULT_MACHINE, version=None):
+    """
+    Returns the process-wide SlotMachine for a configuration id and version, the current one by
+    default, raising KeyError for unknown ids and versions.
+    """
+    if version is None:
+        version = SLOT_MACHINES[machine_id].version
+    return _build_machine(machine_id, version)
+
+
+@lru_cache(maxsize=None)
+def _build_machine(machine_id, version):
+    config = SLOT_MACHINES[machine_id]
+    if config.version != version:
+        config = RETIRED_MACHINES[machine_id, version]
+    return SlotMachine(config)
+
+
+def spin_batch(n, rng=None, lines=None, bet=1, machine_id=DEFAULT_MACHINE):
+    """Generates ``n`` spins of a slot machine in one vectorized call."""
+    return get_machine(machine_id).engine.spin_batch(n, rng, lines, bet)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Casino.history import spool_paths, write_behind_enabled
+from Casino.stats import BACKFILL_CHUNK_SIZE, backfill_counters
+
+
+class Command(BaseCommand):
+    help = ('Recomputes total_winnings, total_losses, experience_points and spin_count of every player from the '
+            'spin history. Safe while spins are played, as each chunk of players is locked while it is '
+            'recomputed. With CASINO_HISTORY_WRITE_BEHIND, spins still queued in the workers are not in the '
+            'history yet: stop the workers, run recover_history and pass --force.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE,
+                            help='Number of players recomputed by each UPDATE.')
+        parser.add_argument('--workers', type=int, default=4, help='Number of chunks updated in parallel.')
+        parser.add_argument('--force', action='store_true',
+                            help='Run with write-behind enabled, once no worker is running.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1.')
+        if write_behind_enabled():
+            if not options['force']:
+                raise CommandError('Spin history is written behind, so recent spins may not be in the table yet. '
+                                   'Stop the workers, run recover_history and pass --force.')
+            if spool_paths():
+                raise CommandError('Spool files with unwritten spins are left; run recover_history first.')
+        started = time.perf_counter()
+        updated = backfill_counters(options['chunk_size'], options['workers'])
+        self.stdout.write(f'Recomputed the counters of {updated} player(s) in {time.perf_counter() - started:.2f}s.')
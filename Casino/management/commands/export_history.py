@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Casino.exports import EXPORT_CHUNK_SIZE, EXPORTS, FORMATS, export_lines
+from Casino.models import Player
+
+
+class Command(BaseCommand):
+    help = "Streams the deposit, bet or spin history of one player, or of all players, as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help='History to export.')
+        parser.add_argument('--format', default='csv', choices=sorted(FORMATS), help='Output format.')
+        parser.add_argument('--player', default=None, help='Username of the player, all players by default.')
+        parser.add_argument('--output', default='-', help='File to write, standard output by default.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Number of rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        player = None
+        if options['player'] is not None:
+            try:
+                player = Player.objects.get(username=options['player'])
+            except Player.DoesNotExist:
+                raise CommandError(f"Unknown player {options['player']!r}.")
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        lines = export_lines(options['kind'], options['format'], player, options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
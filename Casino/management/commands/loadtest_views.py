@@ -0,0 +1,169 @@
+import asyncio
+import time
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+
+from Casino.machines import DEFAULT_MACHINE, SLOT_MACHINES
+from Casino.models import Player
+
+HISTORY_PAGES = ('deposit_history/', 'bet_history/', 'winnings_history/', 'achievements')
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection of one simulated player."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        """Sends a request and reads the whole response, returning its status code."""
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+            lines += [f'{name}: {value}' for name, value in headers.items()]
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+            if status_line:
+                break
+            # The server closed the idle keep-alive connection; reconnect once.
+            await self.close()
+        else:
+            raise ConnectionError(f'{self.host}:{self.port} closed the connection.')
+
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip().lower()
+
+        if 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.read()
+            response_headers['connection'] = 'close'
+        if response_headers.get('connection') == 'close':
+            await self.close()
+        return int(status_line.split()[1])
+
+
+def login_session(player):
+    """Creates a logged-in session of a player and returns its key, without an HTTP login."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = player._meta.pk.value_to_string(player)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = player.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class Command(BaseCommand):
+    help = ('Load-tests the slot machine and history pages of running servers with concurrent simulated '
+            'players and reports requests/sec and latency percentiles for each.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help='Base URL of one deployment, e.g. wsgi=http://127.0.0.1:8000/ for gunicorn '
+                                 'or asgi=http://127.0.0.1:8001/async/ for uvicorn. Repeat to compare.')
+        parser.add_argument('--players', type=int, default=300, help='Number of concurrent simulated players.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests made by each player.')
+        parser.add_argument('--history-every', type=int, default=5,
+                            help='Every n-th request of a player loads a history page instead of spinning.')
+        parser.add_argument('--machine', default=DEFAULT_MACHINE, choices=sorted(SLOT_MACHINES),
+                            help='Slot machine to spin.')
+        parser.add_argument('--bet', type=int, default=1, help='Bet per line of each spin.')
+        parser.add_argument('--lines', type=int, default=1, help='Lines played by each spin.')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            parts = urlsplit(url)
+            if not (name and parts.hostname) or parts.scheme != 'http':
+                raise CommandError(f'--target must look like name=http://host:port/prefix/, not {target!r}.')
+            targets.append((name, parts.hostname, parts.port or 80, parts.path.rstrip('/') + '/'))
+        if options['players'] < 1 or options['requests'] < 1:
+            raise CommandError('--players and --requests must be at least 1.')
+
+        sessions = self.prepare_players(options)
+        for name, host, port, prefix in targets:
+            latencies, errors, elapsed = asyncio.run(self.run_target(host, port, prefix, sessions, options))
+            latencies.sort()
+            total = len(latencies) + errors
+            p50 = latencies[len(latencies) // 2] if latencies else 0.0
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+            self.stdout.write(
+                f'{name}: {total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s, '
+                f'p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, {errors} errors'
+            )
+
+    def prepare_players(self, options):
+        stake = options['bet'] * options['lines'] * options['requests'] * len(options['target'])
+        sessions = []
+        for index in range(options['players']):
+            player, _ = Player.objects.get_or_create(username=f'loadtest-{index}')
+            if player.balance < stake:
+                player.balance = stake
+                player.save(update_fields=['balance'])
+            sessions.append(login_session(player))
+        return sessions
+
+    async def run_target(self, host, port, prefix, sessions, options):
+        spin_path = f'{prefix}slot_machine/{options["machine"]}/'
+        body = {'bet': options['bet'], 'lines': options['lines']}
+        latencies = []
+        errors = 0
+
+        async def play(index, session_key):
+            nonlocal errors
+            csrf_token = get_random_string(32)
+            headers = {
+                'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf_token}',
+                'X-CSRFToken': csrf_token,
+            }
+            form = urlencode(body).encode()
+            connection = HttpConnection(host, port)
+            try:
+                for number in range(options['requests']):
+                    started = time.perf_counter()
+                    try:
+                        if options['history_every'] and (number + index) % options['history_every'] == 0:
+                            page = HISTORY_PAGES[(number + index) % len(HISTORY_PAGES)]
+                            status = await connection.request('GET', prefix + page, headers)
+                        else:
+                            status = await connection.request('POST', spin_path, dict(
+                                headers, **{'Content-Type': 'application/x-www-form-urlencoded'}), form)
+                    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                        status = None
+                        await connection.close()
+                    if status is None or status >= 400:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                await connection.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(play(index, session_key) for index, session_key in enumerate(sessions)))
+        return latencies, errors, time.perf_counter() - started
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Casino.idempotency import KEY_TTL, purge_keys
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired idempotency keys and their stored responses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=KEY_TTL.total_seconds() / 3600,
+                            help='Delete keys older than this many hours.')
+
+    def handle(self, *args, **options):
+        if options['hours'] < 0:
+            raise CommandError('--hours must not be negative.')
+        deleted = purge_keys(timedelta(hours=options['hours']))
+        self.stdout.write(f'Deleted {deleted} idempotency key(s).')
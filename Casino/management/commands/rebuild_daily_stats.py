@@ -0,0 +1,44 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Casino.history import spool_paths, write_behind_enabled
+from Casino.rollups import REBUILD_CHUNK_DAYS, rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the players' daily stats from the spin and deposit history for a range of days, e.g. "
+            'after migrating. Safe while spins and deposits are made, as the rows of each chunk of days are '
+            'locked while they are recomputed. With CASINO_HISTORY_WRITE_BEHIND, spins still queued in the '
+            'workers are counted in the daily stats but not in the history yet, so rebuilding would drop them: '
+            'stop the workers, run recover_history and pass --force.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('first', type=date.fromisoformat, help='First day to rebuild, as YYYY-MM-DD.')
+        parser.add_argument('last', type=date.fromisoformat, nargs='?',
+                            help='Last day to rebuild, as YYYY-MM-DD. Defaults to today.')
+        parser.add_argument('--chunk-days', type=int, default=REBUILD_CHUNK_DAYS,
+                            help='Number of days recomputed by each transaction.')
+        parser.add_argument('--workers', type=int, default=4, help='Number of chunks rebuilt in parallel.')
+        parser.add_argument('--force', action='store_true',
+                            help='Run with write-behind enabled, once no worker is running.')
+
+    def handle(self, *args, **options):
+        first, last = options['first'], options['last'] or timezone.localdate()
+        if options['chunk_days'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-days and --workers must be at least 1.')
+        if first > last:
+            raise CommandError(f'{first} is after {last}.')
+        if write_behind_enabled():
+            if not options['force']:
+                raise CommandError('Spin history is written behind, so recent spins may not be in the table yet. '
+                                   'Stop the workers, run recover_history and pass --force.')
+            if spool_paths():
+                raise CommandError('Spool files with unwritten spins are left; run recover_history first.')
+        started = time.perf_counter()
+        written = rebuild_daily_stats(first, last, options['chunk_days'], options['workers'])
+        self.stdout.write(
+            f'Rebuilt {written} daily stats row(s) from {first} to {last} in {time.perf_counter() - started:.2f}s.'
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from Casino.history import recover_spool
+
+
+class Command(BaseCommand):
+    help = 'Writes the spin history rows left in write-behind spool files by stopped processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spool-dir', default=None,
+                            help='Spool directory, CASINO_HISTORY_SPOOL_DIR by default.')
+
+    def handle(self, *args, **options):
+        recovered = recover_spool(options['spool_dir'])
+        self.stdout.write(f'Recovered {recovered} spin history row(s).')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Casino.tiers import REEVALUATE_BATCH_SIZE, reevaluate_tiers
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the tier of every player from their experience points; meant to run nightly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REEVALUATE_BATCH_SIZE,
+                            help='Number of players read and updated per batch.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        changed = reevaluate_tiers(options['batch_size'])
+        self.stdout.write(f'Changed the tier of {changed} player(s).')
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Casino.machines import DEFAULT_MACHINE, SLOT_MACHINES, get_machine
+from Casino.simulation import run_simulation
+
+
+class Command(BaseCommand):
+    help = 'Runs a multi-process Monte Carlo simulation of a slot machine and compares it with the exact RTP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spins', type=lambda value: int(float(value)), default=10 ** 7,
+                            help='Number of spins to simulate, e.g. 1e9.')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes.')
+        parser.add_argument('--machine', default=DEFAULT_MACHINE, choices=sorted(SLOT_MACHINES),
+                            help='Slot machine configuration to simulate.')
+        parser.add_argument('--lines', type=int, default=None,
+                            help='Number of lines played per spin, all lines by default.')
+        parser.add_argument('--seed', type=int, default=None, help='Root seed for reproducible runs.')
+
+    def handle(self, *args, **options):
+        spins, workers = options['spins'], options['workers']
+        if options['machine'] not in SLOT_MACHINES:
+            raise CommandError(f"Unknown slot machine {options['machine']!r}.")
+        machine = get_machine(options['machine'])
+        lines = machine.max_lines if options['lines'] is None else options['lines']
+        if spins < 2 or workers < 1:
+            raise CommandError('--spins must be at least 2 and --workers at least 1.')
+        if not 1 <= lines <= machine.max_lines:
+            raise CommandError(f'--lines must be between 1 and {machine.max_lines}.')
+
+        result = run_simulation(spins, workers, options['seed'], lines, machine.id)
+        stats = result.stats
+        exact = machine.stats[lines - 1]
+
+        rtp = stats.mean / lines
+        low, high = (bound / lines for bound in stats.mean_interval())
+        hit_margin = 1.96 * (stats.hit_frequency * (1 - stats.hit_frequency) / stats.count) ** 0.5
+
+        self.stdout.write(f'Machine: {machine.config.name}, {lines} line(s)')
+        self.stdout.write(f'Spins: {stats.count} on {workers} worker(s) in {result.elapsed:.2f}s '
+                          f'({stats.count / result.elapsed:,.0f} spins/sec)')
+        self.stdout.write(f'RTP: {rtp:.6f} (95% CI {low:.6f} - {high:.6f}), exact {exact.rtp:.6f}')
+        self.stdout.write(f'Hit frequency: {stats.hit_frequency:.6f} (+/- {hit_margin:.6f}), '
+                          f'exact {exact.hit_frequency:.6f}')
+        self.stdout.write(f'Variance per unit staked: {stats.variance / lines ** 2:.6f}, exact {exact.variance:.6f}')
+        self.stdout.write(f'Max win: {stats.max_payout} x line bet')
+        self.stdout.write('Payout histogram (x line bet: spins):')
+        for payout, count in enumerate(stats.histogram):
+            if count:
+                self.stdout.write(f'  {payout}: {count}')
+
+        if low <= exact.rtp <= high:
+            self.stdout.write(self.style.SUCCESS('Simulated RTP is consistent with the exact calculation.'))
+        else:
+            self.stdout.write(self.style.WARNING('Simulated RTP falls outside the 95% confidence interval.'))
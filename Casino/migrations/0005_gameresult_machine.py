@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0004_achievement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameresult',
+            name='machine',
+            field=models.CharField(default='classic', max_length=32),
+        ),
+    ]
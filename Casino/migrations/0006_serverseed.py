@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0005_gameresult_machine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameresult',
+            name='nonce',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='nonce',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ServerSeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seed', models.CharField(max_length=64)),
+                ('seed_hash', models.CharField(max_length=64)),
+                ('client_seed', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('revealed_at', models.DateTimeField(blank=True, null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='server_seeds', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gameresult',
+            name='server_seed',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Casino.serverseed'),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='active_seed',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Casino.serverseed'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0006_serverseed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameresult',
+            name='spin_code',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gameresult',
+            name='spin_results',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+# Symbol alphabets and grid shapes (rows, cols) of the machines as of this migration, frozen so
+# later configuration changes do not affect it.
+MACHINES = {
+    'classic': (('$', '!', '#', '@'), 3, 3),
+    'five-reel': (('$', '!', '#', '@'), 3, 5),
+}
+
+
+class FrozenCodec:
+    """
+    The grid packing of Casino.codec.GridCodec as of this migration, copied here so later
+    changes to the live codec do not change what the migration writes: symbol indexes of the
+    fewest bits fitting the alphabet, cell by cell in column-major order from the lowest bits.
+    """
+
+    def __init__(self, symbols, rows, cols):
+        self.symbols = symbols
+        self.rows = rows
+        self.cols = cols
+        self.bits = max(1, (len(symbols) - 1).bit_length())
+        self.codes = {symbol: code for code, symbol in enumerate(symbols)}
+
+    def encode(self, columns):
+        packed = 0
+        shift = 0
+        for column in columns:
+            for symbol in column:
+                packed |= self.codes[symbol] << shift
+                shift += self.bits
+        return packed
+
+    def decode(self, packed):
+        mask = (1 << self.bits) - 1
+        return [
+            [self.symbols[packed >> (col * self.rows + row) * self.bits & mask] for row in range(self.rows)]
+            for col in range(self.cols)
+        ]
+
+
+CODECS = {machine: FrozenCodec(*layout) for machine, layout in MACHINES.items()}
+
+
+def _chunks(queryset, fields):
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        yield chunk
+
+
+def pack_spin_results(apps, schema_editor):
+    GameResult = apps.get_model('Casino', 'GameResult')
+    queryset = GameResult.objects.filter(spin_code__isnull=True, spin_results__isnull=False)
+    for chunk in _chunks(queryset, ['machine', 'spin_results']):
+        packed = []
+        for result in chunk:
+            codec = CODECS.get(result.machine)
+            grid = result.spin_results
+            if codec is None or not isinstance(grid, list) or len(grid) != codec.cols \
+                    or any(not isinstance(column, list) or len(column) != codec.rows for column in grid):
+                continue
+            try:
+                result.spin_code = codec.encode(grid)
+            except (KeyError, TypeError):
+                continue
+            result.spin_results = None
+            packed.append(result)
+        GameResult.objects.bulk_update(packed, ['spin_code', 'spin_results'])
+
+
+def unpack_spin_results(apps, schema_editor):
+    GameResult = apps.get_model('Casino', 'GameResult')
+    queryset = GameResult.objects.filter(spin_code__isnull=False, machine__in=list(CODECS))
+    for chunk in _chunks(queryset, ['machine', 'spin_code']):
+        for result in chunk:
+            result.spin_results = CODECS[result.machine].decode(result.spin_code)
+            result.spin_code = None
+        GameResult.objects.bulk_update(chunk, ['spin_code', 'spin_results'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('Casino', '0007_gameresult_spin_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_spin_results, unpack_spin_results),
+    ]
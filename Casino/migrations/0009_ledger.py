@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Bet rows were created right after their GameResult in the same request.
+PAIRING_WINDOW = timedelta(minutes=1)
+
+
+def record_stakes(apps, schema_editor):
+    """
+    Fills GameResult.stake and moves any legacy Bet without a GameResult into the ledger.
+
+    Bets and results of one player are paired in time order: a bet belongs to the latest
+    unpaired result recorded shortly before it with the same total stake.
+    """
+    GameResult = apps.get_model('Casino', 'GameResult')
+    Bet = apps.get_model('Casino', 'Bet')
+    GameResult.objects.update(stake=models.F('lines') * models.F('bet_per_line'))
+
+    player_ids = Bet.objects.order_by().values_list('player', flat=True).distinct()
+    for player_id in player_ids.iterator():
+        results = list(
+            GameResult.objects.filter(player_id=player_id).order_by('created_at', 'pk').values_list('created_at', 'stake')
+        )
+        orphans = []
+        position = 0
+        for amount, bet_date in Bet.objects.filter(player_id=player_id).order_by('bet_date', 'pk').values_list(
+                'amount', 'bet_date').iterator():
+            while position < len(results) and results[position][0] < bet_date - PAIRING_WINDOW:
+                position += 1
+            if position < len(results) and results[position][0] <= bet_date and results[position][1] == amount:
+                position += 1
+            else:
+                orphans.append((amount, bet_date))
+
+        for amount, bet_date in orphans:
+            result = GameResult.objects.create(player_id=player_id, stake=amount, winnings=0, lines=0, bet_per_line=0)
+            GameResult.objects.filter(pk=result.pk).update(created_at=bet_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0008_pack_spin_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameresult',
+            name='stake',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(record_stakes, migrations.RunPython.noop),
+        migrations.RunSQL(
+            migrations.RunSQL.noop,
+            'INSERT INTO "Casino_bet" (id, player_id, amount, bet_date) '
+            'SELECT id, player_id, stake, created_at FROM "Casino_gameresult"',
+        ),
+        migrations.DeleteModel(
+            name='Bet',
+        ),
+        migrations.CreateModel(
+            name='Bet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bet_date', models.DateTimeField()),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'Casino_bet',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            'CREATE VIEW "Casino_bet" AS '
+            'SELECT id, player_id, stake AS amount, created_at AS bet_date FROM "Casino_gameresult"',
+            'DROP VIEW "Casino_bet"',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+CREATE_BET_VIEW = (
+    'CREATE VIEW "Casino_bet" AS '
+    'SELECT id, player_id, stake AS amount, created_at AS bet_date FROM "Casino_gameresult"'
+)
+DROP_BET_VIEW = 'DROP VIEW "Casino_bet"'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0009_ledger'),
+    ]
+
+    # SQLite rebuilds the table on both changes, which fails while a view selects from it.
+    operations = [
+        migrations.RunSQL(DROP_BET_VIEW, CREATE_BET_VIEW),
+        migrations.AlterField(
+            model_name='gameresult',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='gameresult',
+            constraint=models.UniqueConstraint(fields=('server_seed', 'nonce'), name='unique_spin_per_seed_nonce'),
+        ),
+        migrations.RunSQL(CREATE_BET_VIEW, DROP_BET_VIEW),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:59
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_achievements(apps, schema_editor):
+    """Keeps the first of achievements unlocked twice by racing deposits."""
+    Achievement = apps.get_model('Casino', 'Achievement')
+    first_ids = Achievement.objects.values('player', 'name').annotate(first=Min('id')).values('first')
+    Achievement.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_achievements, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='achievement',
+            constraint=models.UniqueConstraint(fields=('player', 'name'), name='unique_achievement_per_player'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Bits of the achievements that existed before the achievement catalogue.
+ACHIEVEMENT_BITS = {
+    'VIP Achievement': 1 << 0,
+    'SUPERVIP Achievement': 1 << 1,
+}
+
+
+def fill_counters(apps, schema_editor):
+    """Sets the bits of already unlocked achievements and counts the spins already played."""
+    Player = apps.get_model('Casino', 'Player')
+    Achievement = apps.get_model('Casino', 'Achievement')
+    GameResult = apps.get_model('Casino', 'GameResult')
+
+    bits = {}
+    for player_id, name in Achievement.objects.filter(name__in=ACHIEVEMENT_BITS).values_list('player', 'name'):
+        bits[player_id] = bits.get(player_id, 0) | ACHIEVEMENT_BITS[name]
+    for player_id, player_bits in bits.items():
+        Player.objects.filter(pk=player_id).update(achievement_bits=player_bits)
+
+    spins = GameResult.objects.filter(player=OuterRef('pk')).order_by().values('player').annotate(
+        count=Count('pk'),
+    ).values('count')
+    Player.objects.update(spin_count=Coalesce(Subquery(spins), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0012_unique_achievement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='achievement_bits',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='spin_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='win_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0013_player_achievement_bits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='achievement',
+            index=models.Index(fields=['player', '-unlocked_date', '-id'], name='achievement_player_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['player', '-deposit_date', '-id'], name='deposit_player_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameresult',
+            index=models.Index(fields=['player', '-created_at', '-id'], name='gameresult_player_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameresult',
+            index=models.Index(condition=models.Q(('winnings__gt', 0)), fields=['player', '-created_at', '-id'], name='gameresult_player_wins_idx'),
+        ),
+    ]
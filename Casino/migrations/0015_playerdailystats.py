@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0014_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('spins', models.PositiveIntegerField(default=0)),
+                ('stake', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('wins', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deposits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('biggest_win', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('player', 'date'), name='unique_daily_stats_per_player')],
+            },
+        ),
+    ]
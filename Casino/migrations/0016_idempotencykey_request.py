@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0015_playerdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='method',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='path',
+            field=models.CharField(blank=True, max_length=2000),
+        ),
+    ]
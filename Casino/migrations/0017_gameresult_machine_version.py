@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+CREATE_BET_VIEW = (
+    'CREATE VIEW "Casino_bet" AS '
+    'SELECT id, player_id, stake AS amount, created_at AS bet_date FROM "Casino_gameresult"'
+)
+DROP_BET_VIEW = 'DROP VIEW "Casino_bet"'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Casino', '0016_idempotencykey_request'),
+    ]
+
+    # Spins made so far were all drawn with version 1 of their machine. SQLite rebuilds the
+    # table to add the column, which fails while a view selects from it.
+    operations = [
+        migrations.RunSQL(DROP_BET_VIEW, CREATE_BET_VIEW),
+        migrations.AddField(
+            model_name='gameresult',
+            name='machine_version',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunSQL(CREATE_BET_VIEW, DROP_BET_VIEW),
+    ]
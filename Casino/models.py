@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, User
+from django.utils import timezone
+
+from .machines import get_machine
 
 STATUS = (
     (1, 'Basic'),
@@ -18,6 +21,11 @@ class Player(AbstractUser):
     total_losses = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.IntegerField(choices=STATUS, default=1)
     experience_points = models.PositiveIntegerField(default=0)
+    spin_count = models.PositiveIntegerField(default=0)
+    win_streak = models.PositiveIntegerField(default=0)
+    achievement_bits = models.BigIntegerField(default=0)
+    active_seed = models.ForeignKey('ServerSeed', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    nonce = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return self.username
@@ -29,33 +37,89 @@ class Player(AbstractUser):
         return self.username
 
 
-class Bet(models.Model):
+class ServerSeed(models.Model):
     """
-    Model representing a betting activity of a player.
+    Model representing a provably-fair server seed, committed to by its hash before any spin
+    uses it and revealed to the player when rotated.
     """
-    player = models.ForeignKey(Player, on_delete=models.CASCADE)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
-    bet_date = models.DateTimeField(auto_now_add=True)
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='server_seeds')
+    seed = models.CharField(max_length=64)
+    seed_hash = models.CharField(max_length=64)
+    client_seed = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    revealed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"{self.player} - {self.amount}"
+        return f"Server seed {self.seed_hash} of {self.player}"
 
 
 class GameResult(models.Model):
     """
     Model representing the result of a casino game played by a player.
+
+    Each row is the append-only wallet ledger entry of one spin, recording its stake, winnings,
+    lines and grid; bets are a projection of it (see ``Bet``).
     """
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    machine = models.CharField(max_length=32, default='classic')
+    machine_version = models.PositiveSmallIntegerField(default=1)
+    stake = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     winnings = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     lines = models.IntegerField(default=1)
     bet_per_line = models.IntegerField(default=10)
-    spin_results = models.JSONField(default=list)
-    created_at = models.DateTimeField(auto_now_add=True)
+    spin_results = models.JSONField(null=True, blank=True, default=None)
+    spin_code = models.BigIntegerField(null=True, blank=True)
+    server_seed = models.ForeignKey(ServerSeed, on_delete=models.SET_NULL, null=True, blank=True)
+    nonce = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['server_seed', 'nonce'], name='unique_spin_per_seed_nonce'),
+        ]
+        indexes = [
+            models.Index(fields=['player', '-created_at', '-id'], name='gameresult_player_date_idx'),
+            models.Index(fields=['player', '-created_at', '-id'], condition=models.Q(winnings__gt=0),
+                         name='gameresult_player_wins_idx'),
+        ]
+
+    @property
+    def grid(self):
+        """
+        The spin grid as columns of symbols, decoded from ``spin_code`` with the machine version
+        that drew it, or None when that machine or version is no longer configured.
+        """
+        if self.spin_code is not None:
+            try:
+                machine = get_machine(self.machine, self.machine_version)
+            except KeyError:
+                return None
+            return machine.codec.decode(self.spin_code)
+        return self.spin_results
 
     def __str__(self):
         return f"Wynik gry: Gracz ID {self.player_id}, Wygrana: {self.winnings}$, Linie: {self.lines}, Zakład na linię: {self.bet_per_line}$"
 
 
+class Bet(models.Model):
+    """
+    Model representing a betting activity of a player.
+
+    Read-only projection of the stakes in the GameResult ledger, backed by a database view
+    sharing GameResult's ids; rows are created by recording a GameResult.
+    """
+    player = models.ForeignKey(Player, on_delete=models.DO_NOTHING)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    bet_date = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'Casino_bet'
+
+    def __str__(self):
+        return f"{self.player} - {self.amount}"
+
+
 class Deposit(models.Model):
     """
     Model representing a deposit made by a player.
@@ -64,6 +128,11 @@ class Deposit(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     deposit_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', '-deposit_date', '-id'], name='deposit_player_date_idx'),
+        ]
+
     def __str__(self):
         return f"Deposit by {self.player.username} - {self.amount}$ at {self.deposit_date}"
 
@@ -77,5 +146,62 @@ class Achievement(models.Model):
     description = models.TextField()
     unlocked_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'name'], name='unique_achievement_per_player'),
+        ]
+        indexes = [
+            models.Index(fields=['player', '-unlocked_date', '-id'], name='achievement_player_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - Unlocked by: {self.player.username}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Model representing a player's recent request made with an idempotency key, with the
+    response to replay when the request is retried. Rows without a status are in progress, or
+    settled when the request's spin or deposit was committed but its response never stored.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    method = models.CharField(max_length=10, blank=True)
+    path = models.CharField(max_length=2000, blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True)
+    settled = models.BooleanField(default=False)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=2000, blank=True)
+    content = models.BinaryField(default=b'')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'key'], name='unique_idempotency_key_per_player'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of player ID {self.player_id}"
+
+
+class PlayerDailyStats(models.Model):
+    """
+    Model representing the totals of a player's spins and deposits on one day, kept up to date
+    as they happen so reports read one row per day instead of the history.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    spins = models.PositiveIntegerField(default=0)
+    stake = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    wins = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    biggest_win = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'date'], name='unique_daily_stats_per_player'),
+        ]
+
+    def __str__(self):
+        return f"Stats of player ID {self.player_id} on {self.date}"
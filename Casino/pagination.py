@@ -0,0 +1,108 @@
+import base64
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+NEXT = 'n'
+PREVIOUS = 'p'
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'previous_cursor'])
+
+
+class InvalidCursor(ValueError):
+    """Raised for page tokens that were not produced by ``encode_cursor``."""
+
+
+def encode_cursor(direction, timestamp, pk):
+    """Returns the URL-safe page token pointing past the row with ``(timestamp, pk)``."""
+    return base64.urlsafe_b64encode(f'{direction}|{timestamp.isoformat()}|{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns the direction, timestamp and id of a page token."""
+    try:
+        direction, timestamp, pk = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split('|')
+        if direction not in (NEXT, PREVIOUS):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(timestamp), int(pk)
+    except ValueError as error:
+        raise InvalidCursor(f'Invalid page token {token!r}.') from error
+
+
+def seek(date_field, direction, timestamp, pk):
+    """
+    Returns the filter keeping the rows past ``(timestamp, pk)``: older ones going forward,
+    newer ones going back.
+
+    The redundant ``date <= %s`` (``>=`` going back) bounds the index range scan; the OR alone
+    only matches the index on its leading columns, so deep pages would scan from the top.
+    """
+    past = 'lt' if direction == NEXT else 'gt'
+    return Q(**{f'{date_field}__{past}e': timestamp}) & (
+        Q(**{f'{date_field}__{past}': timestamp}) | Q(**{date_field: timestamp, f'pk__{past}': pk})
+    )
+
+
+class KeysetPaginator:
+    """
+    Newest-first pagination of a queryset on ``(date_field, id)``.
+
+    A page is fetched by seeking past the last (or, going back, the first) row of the page
+    before it with ``WHERE date <= %s AND (date < %s OR (date = %s AND id < %s))``, so every
+    page costs one index range scan of ``page_size + 1`` rows however deep it is, unlike
+    OFFSET. The extra row tells whether another page follows.
+
+    ``query`` builds the sliced queryset and ``page`` turns its rows, fetched synchronously or
+    asynchronously, into a Page.
+    """
+
+    def __init__(self, queryset, date_field, page_size=PAGE_SIZE):
+        self.queryset = queryset
+        self.date_field = date_field
+        self.page_size = page_size
+
+    def query(self, token=None):
+        """Returns the direction of the page and the queryset of its rows, ignoring invalid tokens."""
+        date_field = self.date_field
+        try:
+            direction, timestamp, pk = decode_cursor(token) if token else (None, None, None)
+        except InvalidCursor:
+            direction = None
+
+        queryset = self.queryset
+        if direction is not None:
+            queryset = queryset.filter(seek(date_field, direction, timestamp, pk))
+        if direction == PREVIOUS:
+            queryset = queryset.order_by(date_field, 'pk')
+        else:
+            queryset = queryset.order_by(f'-{date_field}', '-pk')
+        return direction, queryset[:self.page_size + 1]
+
+    def page(self, direction, rows):
+        """Returns the Page of rows fetched from the queryset ``query`` returned with ``direction``."""
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_newer, has_older = more, True
+        else:
+            has_newer, has_older = direction == NEXT, more
+
+        def cursor(direction, row):
+            return encode_cursor(direction, getattr(row, self.date_field), row.pk)
+
+        return Page(
+            rows,
+            cursor(NEXT, rows[-1]) if has_older and rows else None,
+            cursor(PREVIOUS, rows[0]) if has_newer and rows else None,
+        )
+
+    def get_page(self, token=None):
+        direction, queryset = self.query(token)
+        return self.page(direction, list(queryset))
+
+    async def aget_page(self, token=None):
+        direction, queryset = self.query(token)
+        return self.page(direction, [row async for row in queryset])
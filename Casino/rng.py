@@ -0,0 +1,133 @@
+import os
+import random
+import threading
+import weakref
+from collections import deque
+
+import numpy as np
+
+CHUNK_WORDS = 8192
+LOW_WATER = 2048
+MAX_BUFFERED_BOUNDS = 64
+
+_instances = weakref.WeakSet()
+
+
+class SecureRandom(random.Random):
+    """
+    Cryptographically secure random source serving draws from buffers filled by ``os.urandom``.
+
+    Random 64-bit words are read in chunks of ``chunk_words`` and converted in bulk, with NumPy,
+    into unbiased integers below a given bound by rejection sampling (words at or above the
+    largest multiple of the bound are discarded). Each bound, and ``random()`` floats, gets its
+    own buffer; a background thread refills a buffer once it drops under ``low_water`` so
+    draws on the request path are a ``deque.popleft``. Buffers, locks and the refill thread
+    are discarded in forked children so processes never share random values or deadlock.
+    Like ``random.SystemRandom``, the generator cannot be seeded and has no state to save or
+    restore.
+    """
+
+    def __init__(self, chunk_words=CHUNK_WORDS, low_water=LOW_WATER, max_bounds=MAX_BUFFERED_BOUNDS):
+        self.chunk_words = chunk_words
+        self.low_water = low_water
+        self.max_bounds = max_bounds
+        self._reset()
+        _instances.add(self)
+        super().__init__()
+
+    def _reset(self):
+        # Also run in forked children, where a lock held by another parent thread at the fork
+        # would stay locked forever and the refill thread does not exist.
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._buffers = {}
+        self._low = set()
+        self._wakeup = threading.Event()
+        self._refiller = None
+        self.words_drawn = 0
+        self.words_rejected = 0
+
+    def seed(self, *args, **kwargs):
+        return None
+
+    def getstate(self):
+        raise NotImplementedError('SecureRandom has no state.')
+
+    def setstate(self, state):
+        raise NotImplementedError('SecureRandom has no state.')
+
+    def _convert(self, bound):
+        words = np.frombuffer(os.urandom(8 * self.chunk_words), dtype=np.uint64)
+        if bound is None:
+            values = ((words >> np.uint64(11)) * 2.0 ** -53).tolist()
+        else:
+            limit = (1 << 64) - (1 << 64) % bound
+            if limit < 1 << 64:
+                words = words[words < np.uint64(limit)]
+            values = (words % np.uint64(bound)).tolist()
+
+        with self._stats_lock:
+            self.words_drawn += self.chunk_words
+            self.words_rejected += self.chunk_words - len(values)
+        return values
+
+    def _refill(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self._low:
+                bound = self._low.pop()
+                self._buffers[bound].extend(self._convert(bound))
+
+    def _request_refill(self, bound):
+        self._low.add(bound)
+        self._wakeup.set()
+        if self._refiller is None:
+            with self._lock:
+                if self._refiller is None:
+                    self._refiller = threading.Thread(target=self._refill, name='secure-random-refill', daemon=True)
+                    self._refiller.start()
+
+    def _take(self, bound):
+        buffer = self._buffers.get(bound)
+        if buffer is None:
+            buffer = self._buffers.setdefault(bound, deque())
+        while True:
+            try:
+                value = buffer.popleft()
+                break
+            except IndexError:
+                buffer.extend(self._convert(bound))
+        if len(buffer) < self.low_water and bound not in self._low:
+            self._request_refill(bound)
+        return value
+
+    def random(self):
+        return self._take(None)
+
+    def getrandbits(self, k):
+        if k < 0:
+            raise ValueError('number of bits must be non-negative')
+        numbytes = (k + 7) // 8
+        return int.from_bytes(os.urandom(numbytes), 'big') >> (numbytes * 8 - k)
+
+    def _randbelow(self, n):
+        if n >= 1 << 64 or (n not in self._buffers and len(self._buffers) >= self.max_bounds):
+            return self._randbelow_with_getrandbits(n)
+        return self._take(n)
+
+    def randrange(self, start, stop=None, step=1):
+        if stop is None and step == 1 and type(start) is int and start > 0:
+            return self._randbelow(start)
+        return super().randrange(start, stop, step)
+
+
+def _reset_after_fork():
+    for instance in list(_instances):
+        instance._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+spin_random = SecureRandom()
@@ -0,0 +1,156 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Deposit, GameResult, PlayerDailyStats
+
+REBUILD_CHUNK_DAYS = 7
+COUNTERS = ('spins', 'stake', 'wins', 'deposits')
+
+
+def _upsert_sql():
+    quote = connection.ops.quote_name
+    table = quote(PlayerDailyStats._meta.db_table)
+    player, date = quote(PlayerDailyStats._meta.get_field('player').column), quote('date')
+    columns = [quote(name) for name in COUNTERS + ('biggest_win',)]
+    increments = [f'{column} = {table}.{column} + EXCLUDED.{column}' for column in columns[:-1]]
+    # SQLite's two-argument MAX() is the scalar GREATEST() of PostgreSQL.
+    greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+    biggest_win = columns[-1]
+    increments.append(f'{biggest_win} = {greatest}({table}.{biggest_win}, EXCLUDED.{biggest_win})')
+    return (
+        f'INSERT INTO {table} ({player}, {date}, {", ".join(columns)}) VALUES (%s, %s, %s, %s, %s, %s, %s) '
+        f'ON CONFLICT ({player}, {date}) DO UPDATE SET {", ".join(increments)}'
+    )
+
+
+def add_daily_stats(player_id, when=None, spins=0, stake=0, wins=0, deposits=0, biggest_win=0):
+    """
+    Adds a spin's or deposit's amounts to the player's PlayerDailyStats row for the local date
+    of ``when`` (now by default), creating the row the first time.
+
+    ``INSERT ... ON CONFLICT DO UPDATE`` increments the counters in the database in one
+    statement, so concurrent spins and deposits never lose each other's amounts.
+    """
+    day = timezone.localdate(when)
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(), [player_id, day, spins, stake, wins, deposits, biggest_win])
+
+
+def record_spin_stats(player_id, stake, win, when=None):
+    add_daily_stats(player_id, when, spins=1, stake=stake, wins=win, biggest_win=win)
+
+
+def record_deposit_stats(player_id, amount, when=None):
+    add_daily_stats(player_id, when, deposits=amount)
+
+
+def period_stats(player, first, last):
+    """
+    Returns the player's totals from day ``first`` to day ``last`` included, read from at most
+    one rollup row per day.
+    """
+    totals = PlayerDailyStats.objects.filter(player=player, date__gte=first, date__lte=last).aggregate(
+        **{name: Sum(name) for name in COUNTERS}, biggest_win=Max('biggest_win'),
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def date_chunks(first, last, days=REBUILD_CHUNK_DAYS):
+    """Yields the first and last day of consecutive chunks of ``days`` days from ``first`` to ``last``."""
+    while first <= last:
+        end = min(first + timedelta(days=days - 1), last)
+        yield first, end
+        first = end + timedelta(days=1)
+
+
+def _lock_rows(first, last):
+    """
+    Locks the rollup rows from day ``first`` to day ``last``, returning their ids by
+    ``(player, date)``.
+    """
+    rows = PlayerDailyStats.objects.filter(date__gte=first, date__lte=last).order_by('player', 'date')
+    if connection.features.has_select_for_update:
+        rows = rows.select_for_update()
+    else:
+        # SQLite has no row locks: its database lock is taken by the transaction's first write,
+        # and cannot be once other writers see this transaction read. Take it with a no-op.
+        rows.filter(pk=None).update(spins=F('spins'))
+    return {(player, day): pk for pk, player, day in rows.values_list('pk', 'player', 'date')}
+
+
+def _history_totals(first, last):
+    """Returns the spin and deposit totals from day ``first`` to day ``last`` by ``(player, date)``."""
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    rows = defaultdict(dict)
+    spins = GameResult.objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+        day=TruncDate('created_at'),
+    ).order_by().values('player', 'day').annotate(
+        spins=Count('pk'), stake=Sum('stake'), wins=Sum('winnings'), biggest_win=Max('winnings'),
+    )
+    deposits = Deposit.objects.filter(deposit_date__gte=start, deposit_date__lt=end).annotate(
+        day=TruncDate('deposit_date'),
+    ).order_by().values('player', 'day').annotate(deposits=Sum('amount'))
+    for totals in list(spins) + list(deposits):
+        rows[totals.pop('player'), totals.pop('day')].update(totals)
+    return rows
+
+
+def rebuild_range(first, last):
+    """
+    Recomputes the rollup rows from day ``first`` to day ``last`` from the spin and deposit
+    history in one transaction, returning the number of rows written.
+
+    Spins and deposits upsert their row in the transaction that records them, so once the
+    range's rows are locked, the history read next matches what they count, and spins and
+    deposits made meanwhile wait to add theirs on top of the rebuilt totals. Days of the
+    history without a row get an empty one first, and the rows are locked and read again.
+    The totals are then upserted and rows left without history deleted.
+
+    With write-behind, spins still queued in the workers or left in spool files are counted
+    in their rows but missing from the history, so the rebuild would drop them: stop the
+    workers and run ``recover_history`` first, as the ``rebuild_daily_stats`` command requires.
+    """
+    with transaction.atomic():
+        locked = _lock_rows(first, last)
+        rows = _history_totals(first, last)
+        while missing := rows.keys() - locked.keys():
+            PlayerDailyStats.objects.bulk_create(
+                [PlayerDailyStats(player_id=player, date=day) for player, day in missing], ignore_conflicts=True,
+            )
+            locked = _lock_rows(first, last)
+            rows = _history_totals(first, last)
+        stale = [pk for key, pk in locked.items() if key not in rows]
+        if stale:
+            PlayerDailyStats.objects.filter(pk__in=stale).delete()
+        PlayerDailyStats.objects.bulk_create(
+            [PlayerDailyStats(player_id=player, date=day, **totals) for (player, day), totals in rows.items()],
+            update_conflicts=True, unique_fields=['player', 'date'], update_fields=COUNTERS + ('biggest_win',),
+        )
+    return len(rows)
+
+
+def _rebuild_in_thread(bounds):
+    try:
+        return rebuild_range(*bounds)
+    finally:
+        connection.close()
+
+
+def rebuild_daily_stats(first, last, chunk_days=REBUILD_CHUNK_DAYS, workers=1):
+    """
+    Recomputes the rollup rows from day ``first`` to day ``last`` in chunks of ``chunk_days``
+    days, with up to ``workers`` chunks in flight on their own connections. Returns the number
+    of rows written. Spins not written to the history yet are dropped, see ``rebuild_range``.
+    """
+    chunks = date_chunks(first, last, chunk_days)
+    if workers == 1:
+        return sum(rebuild_range(*bounds) for bounds in chunks)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_rebuild_in_thread, chunks))
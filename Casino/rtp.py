@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict, namedtuple
+from fractions import Fraction
+from math import perm
+
+from .slots import MAX_LINES, ROWS, COLS, symbol_count, symbol_value, column_weights, horizontal_paylines
+
+LineStats = namedtuple('LineStats', ['lines', 'rtp', 'hit_frequency', 'variance', 'line_win_probabilities'])
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def paytable_hash(rows, cols, symbols, values, paylines):
+    """Returns a stable hash identifying a reel and paytable configuration."""
+    payload = json.dumps([rows, cols, list(symbols.items()), list(values.items()), paylines])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _analyze(rows, cols, symbols, values, paylines):
+    column = column_weights(symbols, rows)
+    total = perm(sum(symbols.values()), rows) ** cols
+    code_values = [values[symbol] for symbol in symbols]
+    line_count = len(paylines)
+    full_mask = (1 << line_count) - 1
+
+    payouts = [defaultdict(int) for _ in range(line_count)]
+    line_wins = [0] * line_count
+
+    for first, first_weight in column.items():
+        targets = [first[payline[0]] for payline in paylines]
+
+        masks = {full_mask: first_weight}
+        for col in range(1, cols):
+            column_masks = defaultdict(int)
+            for outcome, weight in column.items():
+                mask = 0
+                for line, payline in enumerate(paylines):
+                    if outcome[payline[col]] == targets[line]:
+                        mask |= 1 << line
+                column_masks[mask] += weight
+
+            combined = defaultdict(int)
+            for mask, weight in masks.items():
+                for column_mask, column_weight in column_masks.items():
+                    combined[mask & column_mask] += weight * column_weight
+            masks = combined
+
+        for mask, weight in masks.items():
+            payout = 0
+            for line in range(line_count):
+                if mask >> line & 1:
+                    payout += code_values[targets[line]]
+                    line_wins[line] += weight
+                payouts[line][payout] += weight
+
+    stats = []
+    for line in range(line_count):
+        lines = line + 1
+        mean = Fraction(sum(payout * weight for payout, weight in payouts[line].items()), total)
+        square = Fraction(sum(payout * payout * weight for payout, weight in payouts[line].items()), total)
+        hits = Fraction(sum(weight for payout, weight in payouts[line].items() if payout > 0), total)
+        stats.append(LineStats(
+            lines=lines,
+            rtp=float(mean / lines),
+            hit_frequency=float(hits),
+            variance=float((square - mean * mean) / (lines * lines)),
+            line_win_probabilities=tuple(float(Fraction(weight, total)) for weight in line_wins[:lines]),
+        ))
+    return tuple(stats)
+
+
+def analyze_paytable(rows=ROWS, cols=COLS, symbols=symbol_count, values=symbol_value, paylines=None,
+                     max_lines=MAX_LINES):
+    """
+    Computes exact return-to-player statistics of a slot machine for 1..max_lines played lines.
+
+    Returns one LineStats per number of lines, where ``rtp`` and ``variance`` are the mean and
+    variance of the payout per unit staked, ``hit_frequency`` is the probability of any win and
+    ``line_win_probabilities`` holds the win probability of each played line. Results are memoized
+    per paytable hash, so each configuration is enumerated only once per process.
+    """
+    if paylines is None:
+        paylines = horizontal_paylines(rows, cols)
+    paylines = [list(payline) for payline in paylines[:max_lines]]
+
+    key = paytable_hash(rows, cols, symbols, values, paylines)
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = _analyze(rows, cols, symbols, values, paylines)
+        return _cache[key]
@@ -0,0 +1,106 @@
+import math
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .machines import DEFAULT_MACHINE, get_machine
+from .slots import BATCH_CHUNK
+
+SimulationResult = namedtuple('SimulationResult', ['stats', 'lines', 'elapsed'])
+
+
+class PayoutAccumulator:
+    """
+    Streaming statistics of spin payouts, kept at constant memory whatever the number of spins.
+
+    Tracks the count, mean and sum of squared deviations (Welford / Chan et al.), the number of
+    winning spins, the largest payout and a histogram of payouts in units of the line bet.
+    Accumulators built in different processes are combined with ``merge``.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.hits = 0
+        self.max_payout = 0
+        self.histogram = np.zeros(1, dtype=np.int64)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def add(self, payouts):
+        """Adds a NumPy array of integer payouts."""
+        if not len(payouts):
+            return
+        mean = float(payouts.mean())
+        self._combine(len(payouts), mean, float(((payouts - mean) ** 2).sum()))
+        self.hits += int(np.count_nonzero(payouts))
+        self.max_payout = max(self.max_payout, int(payouts.max()))
+        self._add_histogram(np.bincount(payouts))
+
+    def merge(self, other):
+        """Folds another accumulator into this one."""
+        if not other.count:
+            return
+        self._combine(other.count, other.mean, other.m2)
+        self.hits += other.hits
+        self.max_payout = max(self.max_payout, other.max_payout)
+        self._add_histogram(other.histogram)
+
+    def _add_histogram(self, histogram):
+        if len(histogram) > len(self.histogram):
+            self.histogram = np.pad(self.histogram, (0, len(histogram) - len(self.histogram)))
+        self.histogram[:len(histogram)] += histogram
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def hit_frequency(self):
+        return self.hits / self.count if self.count else 0.0
+
+    def mean_interval(self, z=1.96):
+        """Returns the normal-approximation confidence interval of the mean payout."""
+        margin = z * math.sqrt(self.variance / self.count) if self.count else 0.0
+        return self.mean - margin, self.mean + margin
+
+
+def simulate(spins, seed, lines, machine_id=DEFAULT_MACHINE):
+    """
+    Plays ``spins`` spins of one line bet per line from an independent RNG stream, drawn with
+    the machine's live sampler so the simulated RTP is the one players get.
+    """
+    machine = get_machine(machine_id)
+    rng = np.random.default_rng(seed)
+    accumulator = PayoutAccumulator()
+    for start in range(0, spins, BATCH_CHUNK):
+        accumulator.add(machine.spin_batch(min(BATCH_CHUNK, spins - start), rng, lines).payouts)
+    return accumulator
+
+
+def run_simulation(spins, workers=1, seed=None, lines=None, machine_id=DEFAULT_MACHINE):
+    """
+    Splits ``spins`` across ``workers`` processes, each with its own child of one SeedSequence,
+    and merges their accumulators.
+    """
+    lines = get_machine(machine_id).max_lines if lines is None else lines
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    shares = [spins // workers + (index < spins % workers) for index in range(workers)]
+
+    started = time.perf_counter()
+    stats = PayoutAccumulator()
+    if workers == 1:
+        stats.merge(simulate(shares[0], seeds[0], lines, machine_id))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for accumulator in executor.map(simulate, shares, seeds, [lines] * workers, [machine_id] * workers):
+                stats.merge(accumulator)
+    return SimulationResult(stats, lines, time.perf_counter() - started)
@@ -0,0 +1,341 @@
+import random
+import threading
+from array import array
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from math import perm
+from operator import itemgetter
+
+import numpy as np
+
+MAX_BET = 300
+MIN_BET = 1
+
+ROWS = 3
+COLS = 3
+
+symbol_count = {
+    '$': 2,
+    '!': 4,
+    '#': 6,
+    "@": 8
+}
+
+symbol_value = {
+    '$': 14,
+    '!': 12,
+    '#': 8,
+    "@": 6
+}
+
+
+def horizontal_paylines(rows, cols):
+    """Returns one payline per row, each as the row index it crosses on every column."""
+    return tuple((row,) * cols for row in range(rows))
+
+
+PAYLINES = horizontal_paylines(ROWS, COLS)
+MAX_LINES = len(PAYLINES)
+
+# Common 20-line layout for 5x3 machines: rows, V-shapes, zig-zags and their mirrors.
+PAYLINES_5x3 = (
+    (1, 1, 1, 1, 1),
+    (0, 0, 0, 0, 0),
+    (2, 2, 2, 2, 2),
+    (0, 1, 2, 1, 0),
+    (2, 1, 0, 1, 2),
+    (0, 0, 1, 2, 2),
+    (2, 2, 1, 0, 0),
+    (1, 0, 0, 0, 1),
+    (1, 2, 2, 2, 1),
+    (0, 1, 1, 1, 0),
+    (2, 1, 1, 1, 2),
+    (1, 0, 1, 0, 1),
+    (1, 2, 1, 2, 1),
+    (0, 1, 0, 1, 0),
+    (2, 1, 2, 1, 2),
+    (1, 1, 0, 1, 1),
+    (1, 1, 2, 1, 1),
+    (0, 0, 2, 0, 0),
+    (2, 2, 0, 2, 2),
+    (0, 2, 0, 2, 0),
+)
+
+BATCH_CHUNK = 65536
+OUTCOME_TABLE_MAX_ENTRIES = 1 << 20
+
+SpinBatch = namedtuple('SpinBatch', ['grids', 'wins', 'payouts'])
+
+
+class ReelModel:
+    """
+    Symbol pool of a slot machine reel, integer-coded and built once per symbol configuration.
+
+    Each column is drawn without replacement with a partial Fisher-Yates shuffle over a
+    preallocated per-thread buffer, which gives the same outcome distribution as picking
+    symbols one by one with ``random.choice`` and removing them from a copy of the pool.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = tuple(symbols)
+        self.counts = tuple(symbols.values())
+        self.pool = array('B', [code for code, count in enumerate(symbols.values()) for _ in range(count)])
+        self._local = threading.local()
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = array('B', self.pool)
+        return buffer
+
+    def spin_codes(self, rows, cols, rng=random):
+        """Returns ``cols`` columns of ``rows`` symbol codes each."""
+        pool = self.pool
+        size = len(pool)
+        buffer = self._buffer()
+        randrange = rng.randrange
+
+        columns = []
+        for _ in range(cols):
+            buffer[:] = pool
+            for i in range(rows):
+                j = i + randrange(size - i)
+                buffer[i], buffer[j] = buffer[j], buffer[i]
+            columns.append(buffer[:rows].tolist())
+        return columns
+
+    def spin(self, rows, cols, rng=random):
+        """Returns ``cols`` columns of ``rows`` symbols each."""
+        symbols = self.symbols
+        return [[symbols[code] for code in column] for column in self.spin_codes(rows, cols, rng)]
+
+
+@lru_cache(maxsize=None)
+def _reel_model(symbol_items):
+    return ReelModel(dict(symbol_items))
+
+
+def get_reel_model(symbols):
+    """Returns the cached ReelModel for a ``{symbol: count}`` configuration."""
+    return _reel_model(tuple(symbols.items()))
+
+
+def column_weights(symbols, rows):
+    """
+    Returns the exact distribution of a column of ``rows`` symbols drawn without replacement,
+    as a mapping of ordered symbol-code tuples to the number of ordered draws producing them.
+    The weights sum to ``perm(sum(symbols.values()), rows)``.
+    """
+    counts = list(symbols.values())
+
+    weights = {(): 1}
+    for _ in range(rows):
+        extended = defaultdict(int)
+        for outcome, weight in weights.items():
+            for code, count in enumerate(counts):
+                left = count - outcome.count(code)
+                if left > 0:
+                    extended[outcome + (code,)] += weight * left
+        weights = extended
+    return weights
+
+
+class OutcomeTable:
+    """
+    Precomputed cumulative outcome table sampling a whole grid with a single random integer.
+
+    Every possible grid is indexed in mixed radix over the distinct column outcomes, and one
+    ``randrange`` over the total number of ordered draws is mapped to a grid by binary search
+    over the cumulative weights. When the joint table would exceed ``max_entries`` rows (or
+    the weights overflow 64 bits), each column is sampled from its own table instead.
+    Drop-in replacement for ``ReelModel.spin`` with the exact same outcome distribution.
+    """
+
+    def __init__(self, reels, rows, cols, max_entries=OUTCOME_TABLE_MAX_ENTRIES):
+        self.reels = reels
+        self.rows = rows
+        self.cols = cols
+
+        weights = column_weights(dict(zip(reels.symbols, reels.counts)), rows)
+        self.outcomes = list(weights)
+        column = np.array(list(weights.values()), dtype=np.int64)
+        self.column_total = perm(len(reels.pool), rows)
+        self.column_cumulative = array('q', np.cumsum(column).tobytes())
+        self._outcome_codes = np.array(self.outcomes, dtype=np.uint8).reshape(len(self.outcomes), rows)
+
+        self.joint = len(column) ** cols <= max_entries and self.column_total ** cols < 1 << 63
+        if self.joint:
+            joint = column
+            for _ in range(cols - 1):
+                joint = np.multiply.outer(joint, column).ravel()
+            self.total = self.column_total ** cols
+            self.cumulative = array('q', np.cumsum(joint).tobytes())
+
+    def spin_codes(self, rows, cols, rng=random):
+        """Returns ``cols`` columns of ``rows`` symbol codes each."""
+        if (rows, cols) != (self.rows, self.cols):
+            raise ValueError(f'Outcome table was built for a {self.cols}x{self.rows} grid.')
+        outcomes = self.outcomes
+        if not self.joint:
+            total, cumulative = self.column_total, self.column_cumulative
+            return [list(outcomes[bisect_right(cumulative, rng.randrange(total))]) for _ in range(cols)]
+
+        index = bisect_right(self.cumulative, rng.randrange(self.total))
+        radix = len(outcomes)
+        columns = []
+        for _ in range(cols):
+            index, outcome = divmod(index, radix)
+            columns.append(list(outcomes[outcome]))
+        columns.reverse()
+        return columns
+
+    def spin(self, rows, cols, rng=random):
+        """Returns ``cols`` columns of ``rows`` symbols each."""
+        symbols = self.reels.symbols
+        return [[symbols[code] for code in column] for column in self.spin_codes(rows, cols, rng)]
+
+    def draw(self, n, rng):
+        """
+        Vectorized counterpart of ``spin_codes`` drawing ``n`` grids from a
+        ``numpy.random.Generator`` as an ``(n, cols, rows)`` array of symbol codes.
+        """
+        if not self.joint:
+            draws = rng.integers(self.column_total, size=(n, self.cols), dtype=np.int64)
+            return self._outcome_codes[np.searchsorted(self.column_cumulative, draws, side='right')]
+
+        index = np.searchsorted(self.cumulative, rng.integers(self.total, size=n, dtype=np.int64), side='right')
+        radix = len(self.outcomes)
+        outcomes = np.empty((n, self.cols), dtype=np.intp)
+        for col in range(self.cols - 1, -1, -1):
+            index, outcomes[:, col] = np.divmod(index, radix)
+        return self._outcome_codes[outcomes]
+
+
+class CompiledPaylines:
+    """
+    Paylines compiled into flat grid indices, built once per payline layout.
+
+    A grid of ``cols`` columns of ``rows`` symbols is flattened column by column, so the cell
+    crossed by a payline on column ``c`` sits at ``c * rows + row``. Evaluating every line is
+    then a single gather of ``indices`` followed by one comparison against the first column.
+    """
+
+    def __init__(self, paylines, rows, cols):
+        for payline in paylines:
+            if len(payline) != cols or not all(0 <= row < rows for row in payline):
+                raise ValueError(f'Payline {payline} does not fit a {cols}x{rows} grid.')
+        self.paylines = tuple(tuple(payline) for payline in paylines)
+        self.rows = rows
+        self.cols = cols
+        self.indices = np.array([[col * rows + row for col, row in enumerate(payline)] for payline in self.paylines],
+                                dtype=np.intp).reshape(len(self.paylines), cols)
+        self._getters = [itemgetter(*line) for line in self.indices.tolist()]
+
+    def __len__(self):
+        return len(self.paylines)
+
+    def check(self, columns, lines, bet, values):
+        """Returns the winnings and the 1-based winning line numbers of a single grid."""
+        cells = [symbol for column in columns for symbol in column]
+        cols = self.cols
+        winnings = 0
+        winning_lines = []
+        for line, getter in enumerate(self._getters[:lines], 1):
+            symbols = getter(cells) if cols > 1 else (getter(cells),)
+            if symbols.count(symbols[0]) == cols:
+                winnings += values[symbols[0]] * bet
+                winning_lines.append(line)
+        return winnings, winning_lines
+
+    def evaluate(self, grids, lines, bet, values):
+        """Returns the ``(n, lines)`` win mask and the ``(n,)`` payouts of a batch of grids."""
+        cells = grids.reshape(len(grids), -1)[:, self.indices[:lines]]
+        first = cells[..., 0]
+        wins = (cells == first[..., np.newaxis]).all(axis=2)
+        payouts = (wins * values[first]).sum(axis=1) * bet
+        return wins, payouts
+
+
+@lru_cache(maxsize=None)
+def compile_paylines(paylines, rows, cols):
+    """Returns the cached CompiledPaylines for a tuple of paylines."""
+    return CompiledPaylines(paylines, rows, cols)
+
+
+class SlotEngine:
+    """
+    Vectorized slot machine engine generating and evaluating many spin grids at once with NumPy.
+
+    Grids are ``(n, cols, rows)`` arrays of symbol codes as defined by the engine's ReelModel.
+    Every grid consumes exactly ``cols * rows`` doubles from a ``numpy.random.Generator``, so
+    ``spin`` called n times and ``spin_batch(n)`` produce identical grids for the same seed.
+    """
+
+    def __init__(self, rows, cols, symbols, values, paylines=None):
+        self.rows = rows
+        self.cols = cols
+        self.paylines = compile_paylines(tuple(paylines or horizontal_paylines(rows, cols)), rows, cols)
+        self.max_lines = len(self.paylines)
+        self.reels = get_reel_model(symbols)
+        self.values = np.array([values[symbol] for symbol in self.reels.symbols], dtype=np.int64)
+        self._code_values = self.values.tolist()
+        self._pool = np.frombuffer(self.reels.pool, dtype=np.uint8).copy()
+        self._remaining = len(self._pool) - np.arange(rows)
+
+    def spin(self, rng):
+        """Draws a single grid as a list of columns of symbol codes."""
+        uniforms = rng.random((self.cols, self.rows)).tolist()
+        pool = self.reels.pool
+        size = len(pool)
+
+        columns = []
+        for column_uniforms in uniforms:
+            buffer = pool.tolist()
+            for i, uniform in enumerate(column_uniforms):
+                j = i + int(uniform * (size - i))
+                buffer[i], buffer[j] = buffer[j], buffer[i]
+            columns.append(buffer[:self.rows])
+        return columns
+
+    def check_winnings(self, columns, lines, bet):
+        """Scalar counterpart of ``evaluate`` for a single grid of symbol codes."""
+        return self.paylines.check(columns, lines, bet, self._code_values)
+
+    def draw(self, n, rng):
+        """Draws ``n`` grids as an ``(n, cols, rows)`` array of symbol codes."""
+        uniforms = rng.random((n, self.cols, self.rows))
+        offsets = (uniforms * self._remaining).astype(np.intp)
+
+        buffer = np.tile(self._pool, (n * self.cols, 1))
+        offsets = offsets.reshape(n * self.cols, self.rows)
+        reel = np.arange(n * self.cols)
+        for i in range(self.rows):
+            j = offsets[:, i] + i
+            picked = buffer[reel, j]
+            buffer[reel, j] = buffer[:, i]
+            buffer[:, i] = picked
+        return buffer[:, :self.rows].reshape(n, self.cols, self.rows)
+
+    def evaluate(self, grids, lines, bet=1):
+        """Returns the ``(n, lines)`` win mask and the ``(n,)`` payouts of a batch of grids."""
+        return self.paylines.evaluate(grids, lines, bet, self.values)
+
+    def spin_batch(self, n, rng=None, lines=None, bet=1, draw=None):
+        """
+        Generates and evaluates ``n`` spins, working through ``BATCH_CHUNK`` grids at a time
+        to bound temporary memory. Grids come from ``draw(n, rng)``, the engine's own ``draw``
+        by default.
+        """
+        rng = np.random.default_rng(rng)
+        draw = self.draw if draw is None else draw
+        lines = self.max_lines if lines is None else lines
+
+        grids = np.empty((n, self.cols, self.rows), dtype=np.uint8)
+        wins = np.empty((n, lines), dtype=bool)
+        payouts = np.empty(n, dtype=np.int64)
+        for start in range(0, n, BATCH_CHUNK):
+            stop = min(start + BATCH_CHUNK, n)
+            grids[start:stop] = draw(stop - start, rng)
+            wins[start:stop], payouts[start:stop] = self.evaluate(grids[start:stop], lines, bet)
+        return SpinBatch(grids, wins, payouts)
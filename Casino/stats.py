@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import GameResult, Player
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _history_total(expression, output_field):
+    total = GameResult.objects.filter(player=OuterRef('pk')).order_by().values('player').annotate(
+        total=Sum(expression, output_field=output_field),
+    ).values('total')
+    return Coalesce(Subquery(total, output_field=output_field), Value(0), output_field=output_field)
+
+
+def recomputed_counters():
+    """
+    Returns the UPDATE expressions recomputing a player's lifetime counters from the spin
+    history, matching what ``settle_spin`` adds per spin. The current win streak is left as is.
+    """
+    money = DecimalField(max_digits=10, decimal_places=2)
+    return {
+        'total_winnings': _history_total(
+            Case(When(winnings__gt=F('stake'), then=F('winnings') - F('stake')), default=Value(0), output_field=money),
+            money,
+        ),
+        'total_losses': _history_total(
+            Case(When(stake__gt=F('winnings'), then=F('stake') - F('winnings')), default=Value(0), output_field=money),
+            money,
+        ),
+        'experience_points': _history_total(Cast('stake', IntegerField()), IntegerField()),
+        'spin_count': _history_total(Value(1), IntegerField()),
+    }
+
+
+def player_id_ranges(chunk_size=BACKFILL_CHUNK_SIZE):
+    """Yields the first and last id of consecutive chunks of players, found by keyset pagination."""
+    last = 0
+    while True:
+        ids = list(Player.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last = ids[-1]
+
+
+def recompute_range(first, last):
+    """
+    Recomputes the counters of the players with ids from ``first`` to ``last`` in one UPDATE.
+
+    The player rows are locked first, so spins in flight commit before the history is read and
+    later spins of those players wait for the UPDATE; the counters then match the history even
+    while spins are being played (without write-behind, whose rows reach the table later).
+    """
+    players = Player.objects.filter(pk__gte=first, pk__lte=last)
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            list(players.select_for_update().values_list('pk', flat=True))
+        return players.update(**recomputed_counters())
+
+
+def _recompute_in_thread(bounds):
+    try:
+        return recompute_range(*bounds)
+    finally:
+        connection.close()
+
+
+def backfill_counters(chunk_size=BACKFILL_CHUNK_SIZE, workers=1):
+    """
+    Recomputes every player's lifetime counters from the spin history, one UPDATE per chunk of
+    ``chunk_size`` players with up to ``workers`` chunks in flight on their own connections.
+    Returns the number of players updated.
+    """
+    ranges = player_id_ranges(chunk_size)
+    if workers == 1:
+        return sum(recompute_range(first, last) for first, last in ranges)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_recompute_in_thread, ranges))
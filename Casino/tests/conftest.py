@@ -16,7 +16,8 @@ def create_player():
 
 @pytest.fixture
 def create_bet(create_player):
-    return Bet.objects.create(player=create_player, amount=50)
+    game_result = GameResult.objects.create(player=create_player, stake=50, lines=5, bet_per_line=10)
+    return Bet.objects.get(pk=game_result.pk)
 
 
 @pytest.fixture
@@ -1,5 +1,8 @@
+import os
+
 import pytest
 from django.urls import reverse
+from Casino.models import GameResult
 
 
 @pytest.mark.django_db
@@ -43,11 +46,21 @@ def test_CustomLogoutView(client):
 def test_PlayerBalanceUpdateView(client, create_player):
     """
     Tests whether the player balance update page (view 'balance') is accessible and returns a status code of 200 (OK)
-    after authenticating the player.
+    after authenticating the player, showing the player's totals of the last 7 days from the daily stats.
     """
+    from datetime import timedelta
+    from decimal import Decimal
+    from django.utils import timezone
+    from Casino.rollups import record_deposit_stats, record_spin_stats
+
+    now = timezone.now()
+    record_spin_stats(create_player.pk, Decimal(4), Decimal(10), now)
+    record_spin_stats(create_player.pk, Decimal(2), Decimal(0), now - timedelta(days=6))
+    record_deposit_stats(create_player.pk, Decimal(50), now - timedelta(days=7))
     client.force_login(create_player)
     response = client.get(reverse('balance'))
     assert response.status_code == 200
+    assert response.context['last_week'] == {'spins': 2, 'stake': 6, 'wins': 10, 'deposits': 0, 'biggest_win': 10}
 
 
 @pytest.mark.django_db
@@ -64,10 +77,13 @@ def test_SlotMachineGameView_get(client):
 def test_SlotMachineGameView_post(client):
     """
     Tests whether the slot machine game page (view 'slot_machine_game') is accessible and returns a status code of 200 (OK)
-    for a POST request.
+    for a POST request, showing the validation message when the bet is not a number.
     """
     response = client.post(reverse('slot_machine_game'))
     assert response.status_code == 200
+    response = client.post(reverse('slot_machine_game'), {'bet': 'x', 'lines': 1})
+    assert response.status_code == 200
+    assert response.context['message'] == 'Bet and lines must be whole numbers!'
 
 
 @pytest.mark.django_db
@@ -123,3 +139,1353 @@ def test_achievements(client, create_player):
     client.force_login(create_player)
     response = client.get(reverse('achievements'))
     assert response.status_code == 200
+
+
+def _legacy_slot_spin(rows, cols, symbols, rng):
+    all_symbols = []
+    for symbol, count in symbols.items():
+        all_symbols.extend([symbol] * count)
+
+    columns = []
+    for _ in range(cols):
+        column = []
+        current_symbols = all_symbols[:]
+        for _ in range(rows):
+            value = rng.choice(current_symbols)
+            current_symbols.remove(value)
+            column.append(value)
+        columns.append(column)
+    return columns
+
+
+def test_ReelModel_matches_legacy_distribution():
+    """
+    Tests whether columns drawn by ReelModel follow the same distribution as the list-based spin it replaced,
+    using a chi-square homogeneity test over all ordered column outcomes.
+    """
+    import random
+    from collections import Counter
+    from Casino.slots import ReelModel, symbol_count
+
+    samples = 20000
+    legacy_rng = random.Random(1)
+    model_rng = random.Random(2)
+    model = ReelModel(symbol_count)
+
+    legacy = Counter(tuple(_legacy_slot_spin(3, 1, symbol_count, legacy_rng)[0]) for _ in range(samples))
+    reel = Counter(tuple(model.spin(3, 1, model_rng)[0]) for _ in range(samples))
+
+    chi_square = 0
+    for outcome in legacy.keys() | reel.keys():
+        expected = (legacy[outcome] + reel[outcome]) / 2
+        chi_square += ((legacy[outcome] - expected) ** 2 + (reel[outcome] - expected) ** 2) / expected
+    degrees_of_freedom = len(legacy.keys() | reel.keys()) - 1
+
+    assert chi_square < degrees_of_freedom + 4 * (2 * degrees_of_freedom) ** 0.5
+
+
+def test_spin_batch_matches_scalar_path():
+    """
+    Tests whether spin_batch produces the same grids, win masks and payouts as the scalar engine path
+    and the view's check_winnings for the same seed.
+    """
+    import numpy as np
+    from Casino.machines import get_machine, spin_batch
+    from Casino.views import SlotMachineGameView
+
+    machine = get_machine('classic')
+    engine = machine.engine
+    batch = spin_batch(2000, 7, lines=3, bet=5)
+    rng = np.random.default_rng(7)
+    view = SlotMachineGameView()
+
+    for grid, wins, payout in zip(batch.grids, batch.wins, batch.payouts):
+        columns = engine.spin(rng)
+        assert columns == grid.tolist()
+
+        symbols = [[engine.reels.symbols[code] for code in column] for column in columns]
+        winnings, winning_lines = view.check_winnings(machine, symbols, 3, 5)
+        assert engine.check_winnings(columns, 3, 5) == (winnings, winning_lines)
+        assert payout == winnings
+        assert [line + 1 for line in np.flatnonzero(wins)] == winning_lines
+
+
+def test_analyze_paytable_matches_brute_force():
+    """
+    Tests whether the exact paytable analysis agrees with brute-force enumeration of every equally likely
+    ordered draw on a small reel configuration.
+    """
+    from fractions import Fraction
+    from itertools import permutations, product
+    from Casino.rtp import analyze_paytable
+    from Casino.slots import compile_paylines, horizontal_paylines
+
+    symbols = {'A': 2, 'B': 3, 'C': 1}
+    values = {'A': 5, 'B': 2, 'C': 9}
+    pool = [symbol for symbol, count in symbols.items() for _ in range(count)]
+    columns = list(permutations(pool, 2))
+    paylines = compile_paylines(horizontal_paylines(2, 3), 2, 3)
+
+    stats = analyze_paytable(rows=2, cols=3, symbols=symbols, values=values, max_lines=2)
+    for lines in (1, 2):
+        payouts = [paylines.check(grid, lines, 1, values)[0] for grid in product(columns, repeat=3)]
+        mean = Fraction(sum(payouts), len(payouts))
+        variance = Fraction(sum(payout * payout for payout in payouts), len(payouts)) - mean * mean
+        hits = Fraction(sum(1 for payout in payouts if payout > 0), len(payouts))
+
+        assert stats[lines - 1].rtp == pytest.approx(float(mean / lines))
+        assert stats[lines - 1].variance == pytest.approx(float(variance / lines ** 2))
+        assert stats[lines - 1].hit_frequency == pytest.approx(float(hits))
+
+
+def test_PayoutAccumulator_merge():
+    """
+    Tests whether merged streaming accumulators report the same statistics as computing them over all payouts at once.
+    """
+    import numpy as np
+    from Casino.simulation import PayoutAccumulator
+
+    payouts = np.random.default_rng(3).integers(0, 40, 10000)
+    merged = PayoutAccumulator()
+    for part in np.array_split(payouts, 7):
+        accumulator = PayoutAccumulator()
+        accumulator.add(part)
+        merged.merge(accumulator)
+
+    assert merged.count == len(payouts)
+    assert merged.mean == pytest.approx(payouts.mean())
+    assert merged.variance == pytest.approx(payouts.var(ddof=1))
+    assert merged.max_payout == payouts.max()
+    assert merged.hits == np.count_nonzero(payouts)
+    assert merged.histogram.tolist() == np.bincount(payouts).tolist()
+
+
+def test_simulate_slots_command():
+    """
+    Tests whether the simulate_slots management command runs and reports throughput and RTP,
+    and rejects a number of lines the machine does not have.
+    """
+    from io import StringIO
+    from django.core.management import CommandError, call_command
+
+    out = StringIO()
+    call_command('simulate_slots', spins=20000, workers=1, seed=1, stdout=out)
+    assert 'spins/sec' in out.getvalue()
+    assert 'exact 0.710000' in out.getvalue()
+    with pytest.raises(CommandError, match='--lines'):
+        call_command('simulate_slots', spins=100, lines=0, stdout=out)
+
+
+def test_simulation_draws_with_live_sampler():
+    """
+    Tests whether the vectorized outcome table maps draws to the same grids as the live sampler
+    and follows the exact column distribution, and whether simulate plays the machine's sampler.
+    """
+    from collections import Counter
+    import numpy as np
+    from Casino.machines import get_machine
+    from Casino.simulation import simulate
+    from Casino.slots import OutcomeTable, column_weights
+
+    class FixedDraws:
+        def __init__(self, values):
+            self.values = list(values)
+
+        def integers(self, high, size, dtype):
+            return np.array(self.values[:np.prod(size)], dtype=dtype).reshape(size)
+
+        def randrange(self, stop):
+            return self.values.pop(0)
+
+    machine = get_machine('classic')
+    reels = machine.engine.reels
+    tables = (machine.sampler, OutcomeTable(reels, 3, 3, max_entries=1))
+    assert [table.joint for table in tables] == [True, False]
+    for table in tables:
+        total = table.total if table.joint else table.column_total
+        values = np.random.default_rng(2).integers(total, size=30 if table.joint else (10, 3)).ravel().tolist()
+        grids = table.draw(10, FixedDraws(values))
+        draws = FixedDraws(values)
+        assert grids.tolist() == [table.spin_codes(3, 3, draws) for _ in range(10)]
+
+        grids = table.draw(60000, np.random.default_rng(5))
+        columns = Counter(map(tuple, grids.reshape(-1, 3).tolist()))
+        weights = column_weights(dict(zip(reels.symbols, reels.counts)), 3)
+        for outcome, weight in weights.items():
+            expected = len(grids) * 3 * weight / table.column_total
+            assert abs(columns[outcome] - expected) < 5 * expected ** 0.5 + 1
+
+    accumulator = simulate(5000, 9, 3, 'classic')
+    assert accumulator.mean == pytest.approx(machine.spin_batch(5000, 9, 3).payouts.mean())
+
+
+def test_compiled_paylines_5x3():
+    """
+    Tests whether 5x3 paylines compiled into index tables evaluate batches and single grids the same way
+    as walking each payline cell by cell, and whether the exact RTP matches a simulation of the layout.
+    """
+    import numpy as np
+    from Casino.rtp import analyze_paytable
+    from Casino.slots import PAYLINES_5x3, SlotEngine
+
+    symbols = {'A': 3, 'B': 5, 'C': 7, 'D': 9}
+    values = {'A': 20, 'B': 10, 'C': 5, 'D': 2}
+    engine = SlotEngine(3, 5, symbols, values, PAYLINES_5x3)
+    batch = engine.spin_batch(50000, 11, lines=20, bet=1)
+
+    for grid, wins, payout in zip(batch.grids[:500].tolist(), batch.wins, batch.payouts):
+        expected_lines = [line for line, payline in enumerate(PAYLINES_5x3, 1)
+                          if len({grid[col][row] for col, row in enumerate(payline)}) == 1]
+        expected = sum(int(engine.values[grid[0][PAYLINES_5x3[line - 1][0]]]) for line in expected_lines)
+        assert engine.check_winnings(grid, 20, 1) == (expected, expected_lines)
+        assert payout == expected
+        assert [line + 1 for line in np.flatnonzero(wins)] == expected_lines
+
+    exact = analyze_paytable(3, 5, symbols, values, PAYLINES_5x3, max_lines=20)[-1]
+    returns = batch.payouts / 20
+    assert abs(returns.mean() - exact.rtp) < 5 * (exact.variance / len(returns)) ** 0.5
+
+
+@pytest.mark.django_db
+def test_SlotMachineGameView_machines(client, create_player):
+    """
+    Tests whether every configured slot machine can be played by id, records the machine on the game result,
+    and whether unknown machine ids return 404 (Not Found).
+    """
+    from Casino.machines import SLOT_MACHINES, get_machine
+
+    client.force_login(create_player)
+    for machine_id in SLOT_MACHINES:
+        response = client.post(reverse('slot_machine', args=[machine_id]), {'bet': 1, 'lines': 1})
+        assert response.status_code == 200
+        assert GameResult.objects.filter(player=create_player, machine=machine_id).exists()
+        assert get_machine(machine_id) is get_machine(machine_id)
+
+    response = client.get(reverse('slot_machine', args=['unknown']))
+    assert response.status_code == 404
+
+
+def test_OutcomeTable_matches_reel_distribution():
+    """
+    Tests whether the single-draw outcome table assigns every grid its exact probability and samples columns
+    with the same distribution as the reel model, for both the joint table and the per-column fallback.
+    """
+    import random
+    from collections import Counter
+    from math import perm
+    from Casino.slots import OutcomeTable, ReelModel, column_weights, symbol_count
+
+    reels = ReelModel(symbol_count)
+    table = OutcomeTable(reels, 3, 3)
+    weights = list(column_weights(symbol_count, 3).values())
+    assert table.joint
+    assert table.total == perm(20, 3) ** 3
+
+    rng = random.Random(5)
+    radix = len(weights)
+    for index in rng.sample(range(len(table.cumulative)), 200):
+        previous = table.cumulative[index - 1] if index else 0
+        first, rest = divmod(index, radix * radix)
+        second, third = divmod(rest, radix)
+        assert table.cumulative[index] - previous == weights[first] * weights[second] * weights[third]
+
+    samples = 10000
+    for sampler in (table, OutcomeTable(reels, 3, 3, max_entries=0)):
+        sampled_grids = [sampler.spin(3, 3, rng) for _ in range(samples)]
+        reel_grids = [reels.spin(3, 3, rng) for _ in range(samples)]
+        for column in range(3):
+            sampled = Counter(tuple(grid[column]) for grid in sampled_grids)
+            reel = Counter(tuple(grid[column]) for grid in reel_grids)
+            outcomes = sampled.keys() | reel.keys()
+            chi_square = sum((sampled[outcome] - reel[outcome]) ** 2 / (sampled[outcome] + reel[outcome])
+                             for outcome in outcomes)
+            degrees_of_freedom = len(outcomes) - 1
+            assert chi_square < degrees_of_freedom + 4 * (2 * degrees_of_freedom) ** 0.5
+
+
+def test_SecureRandom_bounded_draws():
+    """
+    Tests whether SecureRandom serves uniform, in-range integers from its refilled buffers, rejects the biased
+    tail of each chunk and cannot be seeded into a reproducible state.
+    """
+    from collections import Counter
+    from Casino.rng import SecureRandom
+
+    rng = SecureRandom(chunk_words=512, low_water=128)
+    draws = [rng.randrange(7) for _ in range(35000)]
+    counts = Counter(draws)
+    assert set(counts) == set(range(7))
+    chi_square = sum((count - 5000) ** 2 / 5000 for count in counts.values())
+    assert chi_square < 6 + 4 * 12 ** 0.5
+
+    huge = (1 << 63) + 1
+    rejecting = SecureRandom(chunk_words=512, low_water=0)
+    assert all(0 <= rejecting.randrange(huge) < huge for _ in range(2000))
+    assert rejecting.words_rejected > rejecting.words_drawn // 4
+    assert all(0 <= rng.random() < 1 for _ in range(2000))
+    assert 0 <= rng.randrange(1 << 80) < 1 << 80
+
+    with pytest.raises(NotImplementedError):
+        rng.getstate()
+    rng.seed(1)
+    assert [rng.randrange(1 << 60) for _ in range(3)] != [rng.randrange(1 << 60) for _ in range(3)]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Needs os.fork.')
+def test_SecureRandom_after_fork():
+    """
+    Tests whether a child forked while another thread holds the generator's locks draws
+    fresh values instead of deadlocking or sharing the parent's buffers.
+    """
+    import signal
+    import threading
+    from Casino.rng import SecureRandom
+
+    rng = SecureRandom(chunk_words=512, low_water=128)
+    parent_draws = [rng.randrange(1 << 60) for _ in range(50)]
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold_locks():
+        with rng._lock, rng._stats_lock:
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_locks)
+    holder.start()
+    held.wait()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        signal.alarm(5)
+        os.close(read)
+        os.write(write, b','.join(str(rng.randrange(1 << 60)).encode() for _ in range(50)))
+        os._exit(0)
+    release.set()
+    holder.join()
+    os.close(write)
+    with os.fdopen(read, 'rb') as pipe:
+        child_draws = [int(value) for value in pipe.read().split(b',') if value]
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    parent_draws += [rng.randrange(1 << 60) for _ in range(50)]
+    assert len(child_draws) == 50 and not set(child_draws) & set(parent_draws)
+
+
+@pytest.mark.django_db
+def test_provably_fair_spins(client, create_player):
+    """
+    Tests whether spins are committed to the player's server seed with increasing nonces, whether revealed seeds
+    replay every stored grid, and whether a tampered grid is reported as a mismatch.
+    """
+    from Casino.fairness import hash_seed, verify_history
+    from Casino.machines import get_machine
+    from Casino.models import ServerSeed
+
+    client.force_login(create_player)
+    response = client.get(reverse('fairness'))
+    assert response.status_code == 200
+    create_player.refresh_from_db()
+    committed = create_player.active_seed
+    assert committed.seed_hash == hash_seed(committed.seed)
+
+    for machine_id in ('classic', 'five-reel', 'classic'):
+        client.post(reverse('slot_machine', args=[machine_id]), {'bet': 1, 'lines': 1})
+    results = GameResult.objects.filter(player=create_player).order_by('nonce')
+    assert [result.nonce for result in results] == [0, 1, 2]
+    assert all(result.server_seed_id == committed.pk for result in results)
+
+    assert verify_history(create_player).checked == 0
+    response = client.post(reverse('fairness'), {'action': 'rotate', 'client_seed': 'lucky'})
+    assert response.status_code == 200
+    create_player.refresh_from_db()
+    assert create_player.active_seed.client_seed == 'lucky'
+    assert create_player.nonce == 0
+    assert ServerSeed.objects.get(pk=committed.pk).revealed_at is not None
+
+    verification = verify_history(create_player)
+    assert verification == (3, [], [])
+
+    tampered = results[1]
+    grid = tampered.grid
+    grid[0][0] = '$' if grid[0][0] != '$' else '@'
+    tampered.spin_code = get_machine(tampered.machine).codec.encode(grid)
+    tampered.save()
+    assert verify_history(create_player).mismatches == [tampered.pk]
+
+
+@pytest.mark.django_db
+def test_spins_replay_with_their_machine_version(client, create_player, monkeypatch):
+    """
+    Tests whether spins record the version of the machine that drew them, and whether spins
+    drawn before the machine's sampler changed still decode and verify with the retired
+    version, while spins of an unknown version are reported as mismatches.
+    """
+    from Casino.fairness import rotate_seed, verify_history
+    from Casino.machines import RETIRED_MACHINES, SLOT_MACHINES, get_machine
+
+    client.force_login(create_player)
+    for _ in range(2):
+        client.post(reverse('slot_machine', args=['classic']), {'bet': 1, 'lines': 1})
+    current = SLOT_MACHINES['classic']
+    monkeypatch.setitem(RETIRED_MACHINES, ('classic', 1), current)
+    monkeypatch.setitem(SLOT_MACHINES, 'classic', current._replace(sampler='reels', version=2))
+    assert get_machine('classic').config.version == 2
+    for _ in range(2):
+        client.post(reverse('slot_machine', args=['classic']), {'bet': 1, 'lines': 1})
+    create_player.refresh_from_db()
+    rotate_seed(create_player)
+
+    results = GameResult.objects.filter(player=create_player).order_by('nonce')
+    assert [result.machine_version for result in results] == [1, 1, 2, 2]
+    assert all(result.grid is not None for result in results)
+    assert verify_history(create_player) == (4, [], [])
+
+    GameResult.objects.filter(pk=results[0].pk).update(machine_version=7)
+    assert GameResult.objects.get(pk=results[0].pk).grid is None
+    assert verify_history(create_player).mismatches == [results[0].pk]
+
+
+@pytest.mark.django_db
+def test_GridCodec_and_spin_code_migration(create_player):
+    """
+    Tests whether packed spin codes round-trip every grid of each machine, and whether the data migration packs
+    legacy JSON grids into spin_code while GameResult.grid keeps returning the same grid, or None
+    for machines no longer configured.
+    """
+    import importlib
+    import random
+    from django.apps import apps
+    from Casino.machines import SLOT_MACHINES, get_machine
+
+    rng = random.Random(4)
+    for machine_id in SLOT_MACHINES:
+        machine = get_machine(machine_id)
+        config = machine.config
+        for _ in range(200):
+            grid = machine.sampler.spin(config.rows, config.cols, rng)
+            code = machine.codec.encode(grid)
+            assert 0 <= code < 1 << 63
+            assert machine.codec.decode(code) == grid
+
+    legacy_grid = [['$', '!', '#'], ['@', '@', '@'], ['#', '!', '$']]
+    legacy = GameResult.objects.create(player=create_player, spin_results=legacy_grid)
+    migration = importlib.import_module('Casino.migrations.0008_pack_spin_results')
+    migration.pack_spin_results(apps, None)
+
+    legacy.refresh_from_db()
+    assert legacy.spin_results is None
+    assert legacy.spin_code is not None
+    assert legacy.grid == legacy_grid
+
+    migration.unpack_spin_results(apps, None)
+    legacy.refresh_from_db()
+    assert legacy.spin_code is None
+    assert legacy.grid == legacy_grid
+
+    for machine_id, codec in migration.CODECS.items():
+        grid = get_machine(machine_id).spin(rng)
+        assert codec.encode(grid) == get_machine(machine_id).codec.encode(grid)
+        assert codec.decode(codec.encode(grid)) == grid
+    retired = GameResult.objects.create(player=create_player, machine='retired', spin_code=5)
+    assert retired.grid is None
+
+
+@pytest.mark.django_db
+def test_settle_spin_is_conditional_and_race_free(create_player):
+    """
+    Tests whether spins settled from stale copies of one player keep both balance updates, and whether the
+    stake guard and the nonce guard reject a spin without writing anything.
+    """
+    from decimal import Decimal
+    from Casino.fairness import get_active_seed
+    from Casino.models import Player
+    from Casino.wallet import InsufficientFunds, StaleNonce, settle_spin
+
+    seed = get_active_seed(create_player)
+    first = Player.objects.get(pk=create_player.pk)
+    second = Player.objects.get(pk=create_player.pk)
+
+    assert settle_spin(first, 30, 12, seed.id, 0) == Decimal('82.00')
+    with pytest.raises(StaleNonce):
+        settle_spin(second, 10, 0, seed.id, 0)
+    assert settle_spin(second, 10, 0, seed.id, second.nonce) == Decimal('72.00')
+
+    with pytest.raises(InsufficientFunds):
+        settle_spin(first, 100, 500, seed.id, 2)
+
+    create_player.refresh_from_db()
+    assert create_player.balance == Decimal('72.00')
+    assert create_player.nonce == 2
+
+
+@pytest.mark.django_db
+def test_spin_is_one_ledger_row(client, create_player, django_assert_num_queries):
+    """
+    Tests whether a spin commits as one INSERT into the ledger plus one UPDATE of the player and
+    one upsert of the player's daily stats inside one transaction, and whether the bet history
+    projects the stake from the ledger row.
+    """
+    from Casino.fairness import get_active_seed
+    from Casino.models import Bet
+
+    client.force_login(create_player)
+    get_active_seed(create_player)
+    # The first spin unlocks an achievement, see test_spin_unlocking_achievement.
+    client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 1})
+
+    with django_assert_num_queries(7) as context:
+        client.post(reverse('slot_machine_game'), {'bet': 2, 'lines': 3})
+    statements = [query['sql'].split()[0].upper() for query in context.captured_queries]
+    inserts = sorted(query['sql'].split()[2].strip('"') for query in context.captured_queries
+                     if query['sql'].upper().startswith('INSERT'))
+    assert inserts == ['Casino_gameresult', 'Casino_playerdailystats']
+    assert statements.count('UPDATE') == 1
+    assert 'SAVEPOINT' in statements or 'BEGIN' in statements
+
+    game_result = GameResult.objects.filter(player=create_player).latest('pk')
+    bet = Bet.objects.get(pk=game_result.pk)
+    assert (bet.player_id, bet.amount, bet.bet_date) == (create_player.pk, game_result.stake, game_result.created_at)
+    assert game_result.stake == 6
+
+
+@pytest.mark.django_db
+def test_spin_unlocking_achievement(client, create_player, django_assert_num_queries):
+    """
+    Tests whether a spin that unlocks an achievement adds exactly one INSERT of the Achievement
+    rows and one UPDATE of the player's unlocked bits to the spin's statements.
+    """
+    import re
+    from Casino.fairness import get_active_seed
+    from Casino.models import Achievement
+
+    client.force_login(create_player)
+    get_active_seed(create_player)
+    client.get(reverse('slot_machine_game'))
+
+    with django_assert_num_queries(9) as context:
+        client.post(reverse('slot_machine_game'), {'bet': 2, 'lines': 3})
+    statements = [query['sql'].split()[0].upper() for query in context.captured_queries]
+    inserts = sorted(re.search(r'INTO "?(\w+)', query['sql']).group(1) for query in context.captured_queries
+                     if query['sql'].upper().startswith('INSERT'))
+    assert inserts == ['Casino_achievement', 'Casino_gameresult', 'Casino_playerdailystats']
+    assert statements.count('UPDATE') == 2
+    assert list(Achievement.objects.filter(player=create_player).values_list('name', flat=True)) == ['First Spin']
+    create_player.refresh_from_db()
+    assert create_player.achievement_bits == 1 << 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ledger_migration_keeps_legacy_bets():
+    """
+    Tests whether migrating to the ledger fills stakes and keeps legacy bets that have no game result.
+    """
+    from datetime import timedelta
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+    from django.utils import timezone
+    from Casino.models import Bet
+
+    executor = MigrationExecutor(connection)
+    executor.migrate([('Casino', '0008_pack_spin_results')])
+    old_apps = executor.loader.project_state([('Casino', '0008_pack_spin_results')]).apps
+    OldPlayer = old_apps.get_model('Casino', 'Player')
+    OldBet = old_apps.get_model('Casino', 'Bet')
+    OldGameResult = old_apps.get_model('Casino', 'GameResult')
+
+    player = OldPlayer.objects.create(username='legacy')
+    OldGameResult.objects.create(player=player, lines=2, bet_per_line=5)
+    OldBet.objects.create(player=player, amount=10)
+    orphan = OldBet.objects.create(player=player, amount=7)
+    OldBet.objects.filter(pk=orphan.pk).update(bet_date=timezone.now() - timedelta(days=30))
+
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate(executor.loader.graph.leaf_nodes())
+
+    assert sorted(GameResult.objects.filter(player_id=player.pk).values_list('stake', flat=True)) == [7, 10]
+    assert sorted(Bet.objects.filter(player_id=player.pk).values_list('amount', flat=True)) == [7, 10]
+
+
+@pytest.fixture
+def write_behind(settings, tmp_path):
+    from Casino.history import get_writer
+
+    settings.CASINO_HISTORY_WRITE_BEHIND = True
+    settings.CASINO_HISTORY_SPOOL_DIR = tmp_path
+    get_writer.cache_clear()
+    yield get_writer
+    get_writer.cache_clear()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_history(client, create_player, write_behind):
+    """
+    Tests whether write-behind spins only update the balance on the request path and the
+    flusher thread writes their history in a batch, deleting the spool afterwards.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    client.force_login(create_player)
+    client.get(reverse('slot_machine_game'))
+
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(5):
+            client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 1})
+    assert not [query for query in context.captured_queries if 'INSERT INTO "Casino_gameresult"' in query['sql']]
+
+    writer = write_behind()
+    assert writer.flush(timeout=10)
+    results = GameResult.objects.filter(player=create_player).order_by('nonce')
+    assert list(results.values_list('nonce', flat=True)) == [0, 1, 2, 3, 4]
+    assert all(result.stake == 1 for result in results)
+    assert writer.spool_paths() == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_backpressure_and_recovery(create_player, write_behind, tmp_path, monkeypatch):
+    """
+    Tests whether a full queue makes the caller insert the row itself, whether spool segments
+    are rotated per batch, synced to disk row by row with ``fsync`` and deleted once written,
+    and whether only segments left by a crashed process are replayed, once, skipping torn lines
+    and rows already written.
+    """
+    from Casino.fairness import create_seed
+    from Casino.history import HistoryWriter, recover_spool
+
+    seed = create_seed(create_player)
+    row = dict(player_id=create_player.pk, stake=3, lines=3, bet_per_line=1, server_seed_id=seed.pk)
+
+    writer = HistoryWriter(tmp_path / 'live', queue_size=1, put_timeout=0.01)
+    writer._start_flusher = lambda: None
+    writer.record(dict(row, nonce=0))
+    writer.record(dict(row, nonce=1))
+    assert list(GameResult.objects.values_list('nonce', flat=True)) == [1]
+
+    live = writer.spool_paths()
+    assert len(live) == 1
+    assert recover_spool(tmp_path / 'live') == 0 and live[0].exists()
+
+    crashed = tmp_path / 'history-1-0123456789ab-0.jsonl'
+    crashed.write_text(live[0].read_text() + '{"player_id": 1, "sta')
+    assert recover_spool(tmp_path) == 2
+    assert sorted(GameResult.objects.values_list('nonce', flat=True)) == [0, 1]
+    assert not crashed.exists()
+    writer._write([writer._queue.get()])
+    assert writer.spool_paths() == [] and writer.flush(timeout=0)
+
+    synced = []
+    monkeypatch.setattr(os, 'fsync', synced.append)
+    rotating = HistoryWriter(tmp_path / 'rotating', batch_size=2, fsync=True)
+    rotating._start_flusher = lambda: None
+    for nonce in range(2, 7):
+        rotating.record(dict(row, nonce=nonce))
+    assert len(rotating.spool_paths()) == 3
+    # One sync per row and one per segment's directory entry.
+    assert len(synced) == 5 + 3
+    items = [rotating._queue.get() for _ in range(5)]
+    rotating._write(items[:2])
+    assert len(rotating.spool_paths()) == 2
+    rotating._write(items[2:])
+    assert rotating.spool_paths() == [] and GameResult.objects.count() == 7
+
+
+@pytest.mark.django_db
+def test_spin_api(client, create_player):
+    """
+    Tests whether the JSON spin endpoint settles a spin like the form view and answers with a
+    compact payload instead of the rendered page.
+    """
+    from decimal import Decimal
+
+    client.force_login(create_player)
+    page = client.post(reverse('slot_machine_game'), {'bet': 2, 'lines': 3})
+    response = client.post(reverse('api_spin'), {'bet': 2, 'lines': 3})
+    assert response.status_code == 200
+    spin = response.json()
+    assert set(spin) == {'grid', 'winning_lines', 'win', 'balance', 'message'}
+    assert len(spin['grid']) == 3 and all(len(column) == 3 for column in spin['grid'])
+    assert len(response.content) * 10 < len(page.content)
+
+    game_result = GameResult.objects.filter(player=create_player).latest('nonce')
+    assert game_result.grid == spin['grid']
+    assert game_result.winnings == spin['win']
+    create_player.refresh_from_db()
+    assert create_player.balance == Decimal(spin['balance'])
+
+    response = client.post(reverse('api_spin_machine', args=['five-reel']), {'bet': 0, 'lines': 1})
+    assert response.status_code == 400 and response.json()['grid'] is None
+    assert client.post(reverse('api_spin'), {'bet': 'x', 'lines': 1}).status_code == 400
+    assert client.get(reverse('api_spin')).status_code == 405
+
+
+@pytest.mark.django_db
+def test_async_views(client, create_player, create_deposit, create_achievement):
+    """
+    Tests whether the async slot machine and history views answer like their synchronous
+    counterparts and still require a logged-in player for the histories.
+    """
+    history = {'async-deposit-history': 'deposit-history', 'async-bet-history': 'bet-history',
+               'async-win-history': 'win-history', 'async-achievements': 'achievements'}
+    for name, sync_name in history.items():
+        response = client.get(reverse(name))
+        assert response.status_code == 302
+        assert response.url.split('?')[0] == client.get(reverse(sync_name)).url.split('?')[0]
+
+    client.force_login(create_player)
+    response = client.get(reverse('async-slot_machine', args=['five-reel']))
+    assert response.status_code == 200
+    assert response.context['balance'] == create_player.balance
+
+    response = client.post(reverse('async-slot_machine_game'), {'bet': 2, 'lines': 3})
+    assert response.status_code == 200
+    game_result = GameResult.objects.get(player=create_player)
+    assert game_result.stake == 6 and response.context['balance'] == create_player.balance - 6 + game_result.winnings
+    response = client.post(reverse('async-slot_machine_game'), {'bet': '2.5', 'lines': 3})
+    assert response.status_code == 200
+    assert response.context['message'] == 'Bet and lines must be whole numbers!'
+    assert GameResult.objects.filter(player=create_player).count() == 1
+
+    for name, key, count in [('async-deposit-history', 'deposits', 1), ('async-bet-history', 'bets', 1),
+                             ('async-achievements', 'player_achievements', 2)]:
+        response = client.get(reverse(name))
+        assert response.status_code == 200 and len(response.context[key]) == count
+    response = client.get(reverse('async-win-history'))
+    assert response.status_code == 200 and len(response.context['winnings']) == (game_result.winnings > 0)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loadtest_views_command(live_server):
+    """Tests whether the load test plays concurrent logged-in spins and history requests against a running server."""
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connection
+    from Casino.models import Player
+
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        pytest.skip('The live server shares one in-memory SQLite connection between its request threads.')
+
+    out = StringIO()
+    call_command('loadtest_views', target=[f'live={live_server.url}/'], players=4, requests=5, stdout=out)
+    assert 'live: 20 requests' in out.getvalue()
+    assert out.getvalue().rstrip().endswith(' 0 errors'), out.getvalue()
+    assert GameResult.objects.filter(player__in=Player.objects.filter(username__startswith='loadtest-')).count() == 16
+
+
+@pytest.mark.django_db
+def test_idempotency_keys(client, create_player, monkeypatch):
+    """
+    Tests whether retried spins and deposits with the same idempotency key replay the first
+    response without spinning or paying again, whether a key reused for another request gets a
+    422, whether abandoned reservations expire after their lease unless their deposit was made,
+    and whether expired keys are purged.
+    """
+    from datetime import timedelta
+    from io import StringIO
+    from django.core.management import call_command
+    from django.utils import timezone
+    from urllib.parse import urlencode
+    from django.test import RequestFactory
+    from Casino import idempotency
+    from Casino.idempotency import ReservationLost, _responses, fingerprint, settle
+    from Casino.models import Deposit, IdempotencyKey
+
+    client.force_login(create_player)
+    page = client.get(reverse('slot_machine_game'))
+    key = page.context['idempotency_key']
+    first = client.post(reverse('slot_machine_game'), {'bet': 2, 'lines': 3, 'idempotency_key': key})
+    _responses.clear()
+    retry = client.post(reverse('slot_machine_game'), {'bet': 2, 'lines': 3, 'idempotency_key': key})
+    assert retry['Idempotent-Replayed'] == 'true' and retry.content == first.content
+    urlencoded = client.post(reverse('slot_machine_game'), urlencode({'bet': 2, 'lines': 3}),
+                             content_type='application/x-www-form-urlencoded', HTTP_IDEMPOTENCY_KEY=key)
+    assert urlencoded.content == first.content
+    assert client.post(reverse('api_spin'), {'bet': 2, 'lines': 3}, HTTP_IDEMPOTENCY_KEY=key).status_code == 422
+    assert client.post(reverse('slot_machine_game'), {'bet': 3, 'lines': 3},
+                       HTTP_IDEMPOTENCY_KEY=key).status_code == 422
+    assert client.post(reverse('async-slot_machine_game'), {'bet': 2, 'lines': 3},
+                       HTTP_IDEMPOTENCY_KEY=key).status_code == 422
+    assert GameResult.objects.filter(player=create_player).count() == 1
+
+    api = client.post(reverse('api_spin'), {'bet': 1, 'lines': 1}, HTTP_IDEMPOTENCY_KEY='api-1')
+    _responses.clear()
+    assert client.post(reverse('api_spin'), {'bet': 1, 'lines': 1}, HTTP_IDEMPOTENCY_KEY='api-1').content == api.content
+    fallback = client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 1, 'idempotency_key': 'api-1'})
+    assert fallback.status_code == 422
+    assert GameResult.objects.filter(player=create_player).count() == 2
+
+    async_first = client.post(reverse('async-slot_machine_game'), {'bet': 1, 'lines': 1},
+                              HTTP_IDEMPOTENCY_KEY='async-1')
+    async_retry = client.post(reverse('async-slot_machine_game'), {'bet': 1, 'lines': 1},
+                              HTTP_IDEMPOTENCY_KEY='async-1')
+    assert async_retry['Idempotent-Replayed'] == 'true' and async_retry.content == async_first.content
+    assert GameResult.objects.filter(player=create_player).count() == 3
+
+    for _ in range(2):
+        response = client.post(reverse('balance'), {'balance': 50}, HTTP_IDEMPOTENCY_KEY='deposit-1')
+        assert response.status_code == 302 and response['Location'] == reverse('home')
+    assert Deposit.objects.filter(player=create_player).count() == 1
+    create_player.refresh_from_db()
+    results = GameResult.objects.filter(player=create_player)
+    assert create_player.balance == 100 + sum(result.winnings - result.stake for result in results) + 50
+
+    spin_path = reverse('slot_machine_game')
+    signature = {'method': 'POST', 'path': spin_path, 'fingerprint': fingerprint(RequestFactory().post(
+        spin_path, {'bet': 1, 'lines': 1},
+    ))}
+    IdempotencyKey.objects.create(player=create_player, key='in-flight', **signature)
+    assert client.post(spin_path, {'bet': 1, 'lines': 1}, HTTP_IDEMPOTENCY_KEY='in-flight').status_code == 409
+    abandoned = timezone.now() - timedelta(minutes=1)
+    IdempotencyKey.objects.create(player=create_player, key='crashed', created_at=abandoned, **signature)
+    response = client.post(spin_path, {'bet': 1, 'lines': 1}, HTTP_IDEMPOTENCY_KEY='crashed')
+    assert response.status_code == 200 and 'Idempotent-Replayed' not in response
+    assert IdempotencyKey.objects.get(key='crashed').status_code == 200
+    assert client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 1},
+                       HTTP_IDEMPOTENCY_KEY='x' * 65).status_code == 400
+
+    # The worker dies after the deposit commits, before storing the response.
+    with monkeypatch.context() as patched:
+        patched.setattr(idempotency, '_complete', lambda reservation, response: None)
+        client.post(reverse('balance'), {'balance': 7}, HTTP_IDEMPOTENCY_KEY='deposit-lost')
+    lost = IdempotencyKey.objects.get(key='deposit-lost')
+    assert lost.settled and lost.status_code is None
+    IdempotencyKey.objects.filter(pk=lost.pk).update(created_at=abandoned)
+    response = client.post(reverse('balance'), {'balance': 7}, HTTP_IDEMPOTENCY_KEY='deposit-lost')
+    assert response.status_code == 409
+    assert Deposit.objects.filter(player=create_player, amount=7).count() == 1
+
+    request = RequestFactory().post(spin_path)
+    request.idempotency_reservation = IdempotencyKey.objects.get(key='in-flight')
+    IdempotencyKey.objects.filter(key='in-flight').delete()
+    with pytest.raises(ReservationLost):
+        settle(request)
+
+    IdempotencyKey.objects.filter(key=key).update(created_at=timezone.now() - timedelta(days=2))
+    out = StringIO()
+    call_command('purge_idempotency_keys', stdout=out)
+    assert 'Deleted 1 ' in out.getvalue()
+    assert set(IdempotencyKey.objects.values_list('key', flat=True)) == {
+        'api-1', 'async-1', 'deposit-1', 'crashed', 'deposit-lost',
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_player_counters_and_backfill(client, create_player, settings, tmp_path):
+    """
+    Tests whether spins keep the player's winnings, losses and experience counters in step with
+    the spin history, whether the backfill command recomputes them in parallel chunks, and
+    whether it refuses to run while write-behind spins may be missing from the history.
+    """
+    from io import StringIO
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+    from Casino.models import Player
+
+    other = Player.objects.create(username='other', balance=100)
+    client.force_login(create_player)
+    for _ in range(10):
+        client.post(reverse('slot_machine_game'), {'bet': 2, 'lines': 3})
+
+    def counters():
+        return list(Player.objects.order_by('pk').values_list('total_winnings', 'total_losses', 'experience_points'))
+
+    results = GameResult.objects.filter(player=create_player)
+    create_player.refresh_from_db()
+    assert create_player.experience_points == 60
+    assert create_player.total_winnings == sum(max(result.winnings - result.stake, 0) for result in results)
+    assert create_player.total_losses == sum(max(result.stake - result.winnings, 0) for result in results)
+    assert create_player.balance == 100 + create_player.total_winnings - create_player.total_losses
+    expected = counters()
+
+    Player.objects.update(total_winnings=5, total_losses=5, experience_points=5)
+    out = StringIO()
+    call_command('backfill_player_stats', chunk_size=1, workers=2, stdout=out)
+    assert 'counters of 2 player(s)' in out.getvalue()
+    assert counters() == expected
+    assert expected[1] == (other.total_winnings, other.total_losses, other.experience_points)
+
+    settings.CASINO_HISTORY_WRITE_BEHIND = True
+    settings.CASINO_HISTORY_SPOOL_DIR = tmp_path
+    with pytest.raises(CommandError, match='written behind'):
+        call_command('backfill_player_stats', stdout=out)
+    (tmp_path / 'history-1-0123456789ab-0.jsonl').write_text('')
+    with pytest.raises(CommandError, match='recover_history'):
+        call_command('backfill_player_stats', force=True, stdout=out)
+    call_command('recover_history', stdout=out)
+    Player.objects.update(experience_points=5)
+    call_command('backfill_player_stats', force=True, workers=1, stdout=out)
+    assert counters() == expected
+
+
+@pytest.mark.django_db
+def test_tier_promotion_and_reevaluation(client, create_player, django_assert_max_num_queries):
+    """
+    Tests whether a spin crossing a tier boundary promotes the player at once, and whether the
+    nightly re-evaluation fixes every player's tier with batched updates.
+    """
+    from io import StringIO
+    from django.core.management import call_command
+    from Casino.models import Player
+    from Casino.tiers import TIER_RULES, tier_for
+
+    assert [tier_for(rule.min_experience_points) for rule in TIER_RULES] == [rule.status for rule in TIER_RULES]
+    assert tier_for(TIER_RULES[1].min_experience_points - 1) == 1
+
+    Player.objects.filter(pk=create_player.pk).update(experience_points=TIER_RULES[1].min_experience_points - 4)
+    client.force_login(create_player)
+    client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 2})
+    create_player.refresh_from_db()
+    assert create_player.status == 1
+    client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 2})
+    create_player.refresh_from_db()
+    assert create_player.status == 2
+
+    Player.objects.bulk_create([
+        Player(username=f'tier-{index}', experience_points=rule.min_experience_points, status=1)
+        for index, rule in enumerate(TIER_RULES * 3)
+    ])
+    Player.objects.filter(pk=create_player.pk).update(status=4)
+    out = StringIO()
+    with django_assert_max_num_queries(3 + 4 * 3):
+        call_command('reevaluate_tiers', batch_size=5, stdout=out)
+    assert 'tier of 10 player(s)' in out.getvalue()
+    assert all(player.status == tier_for(player.experience_points) for player in Player.objects.all())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_deposits(client, create_player):
+    """
+    Tests whether deposits made at the same time from many threads all reach the balance and
+    unlock a deposit achievement once, and whether a deposit takes three statements.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from decimal import Decimal
+    from django.db import connection as default_connection
+    from django.test.utils import CaptureQueriesContext
+    from Casino.models import Achievement, Deposit, Player
+    from Casino.wallet import WalletError, deposit
+
+    if default_connection.vendor == 'sqlite' and default_connection.is_in_memory_db():
+        pytest.skip('Concurrent writers need a database that makes them wait for locks.')
+
+    def pay(amount):
+        player = Player.objects.get(pk=create_player.pk)
+        try:
+            deposit(player, amount)
+        finally:
+            default_connection.close()
+
+    amounts = [Decimal(10000 + index) for index in range(8)] + [Decimal(5)] * 8
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(pay, amounts))
+
+    create_player.refresh_from_db()
+    assert create_player.balance == 100 + sum(amounts)
+    assert Deposit.objects.filter(player=create_player).count() == len(amounts)
+    assert list(Achievement.objects.filter(player=create_player).values_list('name', flat=True)) == ['VIP Achievement']
+
+    with CaptureQueriesContext(default_connection) as context:
+        deposit(create_player, Decimal(5))
+    statements = [query['sql'].split()[0].upper() for query in context.captured_queries]
+    assert [statement for statement in statements if statement in ('UPDATE', 'INSERT', 'SELECT')] == [
+        'UPDATE', 'INSERT', 'INSERT',
+    ]
+    with pytest.raises(WalletError):
+        deposit(create_player, Decimal(0))
+
+    client.force_login(create_player)
+    response = client.post(reverse('balance'), {'balance': 100000})
+    assert response.status_code == 302
+    assert Achievement.objects.filter(player=create_player, name='SUPERVIP Achievement').exists()
+    assert client.post(reverse('balance'), {'balance': -5}).status_code == 200
+    create_player.refresh_from_db()
+    assert create_player.balance == 100 + sum(amounts) + 5 + 100000
+
+
+@pytest.mark.django_db
+def test_achievement_engine(client, create_player, django_assert_num_queries):
+    """
+    Tests whether spin and deposit events unlock catalogue achievements once, keep the player's
+    unlocked bitset in step with the Achievement rows, and cost no query once nothing can unlock,
+    and whether every multiplier rule can be reached on every machine.
+    """
+    from decimal import Decimal
+    from Casino.achievements import ACHIEVEMENT_RULES, unlock_achievements, unlock_spin_achievements
+    from Casino.machines import SLOT_MACHINES
+    from Casino.models import Achievement
+
+    assert len({rule.bit for rule in ACHIEVEMENT_RULES}) == len(ACHIEVEMENT_RULES)
+    for rule in ACHIEVEMENT_RULES:
+        if rule.fact == 'multiplier':
+            assert all(max(config.values.values()) >= rule.minimum for config in SLOT_MACHINES.values()), rule
+
+    client.force_login(create_player)
+    client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 1})
+    create_player.refresh_from_db()
+    assert create_player.spin_count == 1
+    assert list(Achievement.objects.filter(player=create_player).values_list('name', flat=True)) == ['First Spin']
+
+    create_player.spin_count, create_player.win_streak = 100, 5
+    unlocked = unlock_spin_achievements(create_player, 10, 600)
+    assert {rule.name for rule in unlocked} == {'Regular', 'Hot Streak', 'On Fire', 'Big Win'}
+    with django_assert_num_queries(0):
+        assert unlock_spin_achievements(create_player, 10, 600) == []
+        assert unlock_achievements(create_player, 'deposit', amount=Decimal(50)) == []
+
+    create_player.achievement_bits = 0
+    unlock_spin_achievements(create_player, 10, 600)
+    names = list(Achievement.objects.filter(player=create_player).values_list('name', flat=True))
+    assert sorted(names) == sorted(['First Spin', 'Regular', 'Hot Streak', 'On Fire', 'Big Win'])
+
+    create_player.refresh_from_db()
+    expected = sum(1 << rule.bit for rule in ACHIEVEMENT_RULES if rule.name in names)
+    assert create_player.achievement_bits == expected
+
+    # The classic machine's best spin, its top symbol on every line, is a Big Win.
+    Achievement.objects.filter(player=create_player, name='Big Win').delete()
+    create_player.achievement_bits = 0
+    classic_top = max(SLOT_MACHINES['classic'].values.values())
+    assert 'Big Win' in {rule.name for rule in unlock_spin_achievements(create_player, 3, 3 * classic_top)}
+
+
+@pytest.mark.django_db
+def test_keyset_pagination(client, create_player, django_assert_num_queries):
+    """
+    Tests whether the history pages walk forward and back over rows sharing timestamps with
+    next/previous tokens, one bounded query per page, and fall back to the first page on bad tokens.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from Casino.models import Deposit
+    from Casino.pagination import KeysetPaginator, decode_cursor, InvalidCursor
+
+    now = timezone.now()
+    Deposit.objects.bulk_create([Deposit(player=create_player, amount=index + 1) for index in range(7)])
+    for index, deposit in enumerate(Deposit.objects.order_by('pk')):
+        Deposit.objects.filter(pk=deposit.pk).update(deposit_date=now - timedelta(seconds=index // 2))
+    expected = list(Deposit.objects.order_by('-deposit_date', '-pk').values_list('pk', flat=True))
+
+    paginator = KeysetPaginator(Deposit.objects.filter(player=create_player), 'deposit_date', page_size=3)
+    pages = [paginator.get_page()]
+    while pages[-1].next_cursor:
+        with django_assert_num_queries(1):
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+    assert [[deposit.pk for deposit in page.items] for page in pages] == [expected[:3], expected[3:6], expected[6:]]
+    assert pages[0].previous_cursor is None and pages[-1].next_cursor is None
+
+    back = paginator.get_page(pages[2].previous_cursor)
+    assert [deposit.pk for deposit in back.items] == expected[3:6]
+    back = paginator.get_page(back.previous_cursor)
+    assert [deposit.pk for deposit in back.items] == expected[:3] and back.previous_cursor is None
+    assert back.next_cursor == pages[0].next_cursor
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor('bm9wZQ')
+    assert [deposit.pk for deposit in paginator.get_page('bm9wZQ').items] == expected[:3]
+
+    client.force_login(create_player)
+    response = client.get(reverse('deposit-history'))
+    assert len(response.context['deposits']) == 7 and response.context['page'].next_cursor is None
+    for name in ['bet-history', 'win-history', 'async-deposit-history']:
+        assert client.get(reverse(name), {'cursor': pages[0].next_cursor}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_history_queries_use_indexes(create_player):
+    """
+    Tests whether each history query, as the history views and the activity feed run it, reads
+    a player's rows in order from a composite index instead of sorting them, and whether cursor
+    pages in both directions seek into that index on the date instead of scanning from the top.
+    """
+    import re
+    from django.db import connection
+    from django.utils import timezone
+    from Casino.activity import FEED_SOURCES, ActivityFeed, ActivityItem, encode_feed_cursor
+    from Casino.models import Achievement, Bet, Deposit
+    from Casino.pagination import NEXT, PREVIOUS, KeysetPaginator, encode_cursor
+
+    # The index and the indexed date column each source reads, the Bet view's being its table's.
+    indexes = {
+        'deposit': ('deposit_player_date_idx', 'deposit_date'),
+        'bet': ('gameresult_player_date_idx', 'created_at'),
+        'win': ('gameresult_player_wins_idx', 'created_at'),
+        'achievement': ('achievement_player_date_idx', 'unlocked_date'),
+    }
+    paginators = {
+        'deposit': KeysetPaginator(Deposit.objects.filter(player=create_player), 'deposit_date'),
+        'bet': KeysetPaginator(Bet.objects.filter(player=create_player), 'bet_date'),
+        'win': KeysetPaginator(GameResult.objects.filter(player=create_player, winnings__gt=0), 'created_at'),
+    }
+    if connection.vendor == 'postgresql':
+        # The test tables are tiny, so make the planner show the plan it would pick for big ones.
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+    def check(kind, queryset, seek):
+        index, column = indexes[kind]
+        plan = queryset.explain()
+        assert index in plan, plan
+        if connection.vendor == 'postgresql':
+            assert 'Index Scan' in plan or 'Index Only Scan' in plan, plan
+            assert 'Sort' not in plan, plan
+            if seek:
+                assert re.search(rf'Index Cond: .*player_id.*{column}', plan), plan
+        elif connection.vendor == 'sqlite':
+            assert 'USING INDEX' in plan and 'TEMP B-TREE' not in plan, plan
+            if seek:
+                assert re.search(rf'INDEX {index} \(player_id=\? AND {column}[<>]', plan), plan
+
+    now = timezone.now()
+    check('achievement', Achievement.objects.filter(player=create_player).order_by('-unlocked_date'), False)
+    for kind, paginator in paginators.items():
+        check(kind, paginator.query()[1], False)
+        for direction in (NEXT, PREVIOUS):
+            check(kind, paginator.query(encode_cursor(direction, now, 1))[1], True)
+
+    feed = ActivityFeed(create_player)
+    for kind, queryset in zip(indexes, feed.query()[1]):
+        check(kind, queryset, False)
+    for direction in (NEXT, PREVIOUS):
+        for source in FEED_SOURCES:
+            token = encode_feed_cursor(direction, ActivityItem(now, source.rank, 1, source.kind, None))
+            for kind, queryset in zip(indexes, feed.query(token)[1]):
+                check(kind, queryset, True)
+
+
+@pytest.mark.django_db
+def test_history_exports(client, create_player, create_deposit, tmp_path):
+    """
+    Tests whether the export endpoints stream a player's deposits, bets and spins as CSV and
+    JSON Lines in date order, read off the player's date index, and whether the management
+    command writes the same export to a file.
+    """
+    import csv
+    import json
+    from datetime import timedelta
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connection
+    from django.utils import timezone
+    from Casino.exports import EXPORTS, export_queryset
+    from Casino.models import Player
+
+    client.force_login(create_player)
+    for _ in range(3):
+        client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 2})
+    other = Player.objects.create(username='other')
+    GameResult.objects.create(player=other, stake=1)
+    # The first spin is moved past the others, so date order differs from id order.
+    first = GameResult.objects.filter(player=create_player).order_by('pk').first()
+    GameResult.objects.filter(pk=first.pk).update(created_at=timezone.now() + timedelta(hours=1))
+
+    for kind in EXPORTS:
+        plan = export_queryset(kind, create_player).explain()
+        assert '_player_date_idx' in plan, plan
+        if connection.vendor == 'postgresql':
+            assert 'Sort' not in plan, plan
+        elif connection.vendor == 'sqlite':
+            assert 'TEMP B-TREE' not in plan, plan
+
+    response = client.get(reverse('export', args=['spins', 'csv']))
+    assert response.streaming and response['Content-Type'] == 'text/csv'
+    assert response['Content-Disposition'] == 'attachment; filename="testuser-spins.csv"'
+    rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+    results = GameResult.objects.filter(player=create_player).order_by('created_at', 'pk')
+    assert results[2].pk == first.pk
+    assert [int(row['id']) for row in rows] == [result.pk for result in results]
+    assert [row['grid'] for row in rows] == ['|'.join(''.join(column) for column in result.grid) for result in results]
+
+    response = client.get(reverse('export', args=['bets', 'jsonl']))
+    bets = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [(bet['id'], bet['amount']) for bet in bets] == [(result.pk, '2.00') for result in results]
+    assert client.get(reverse('export', args=['deposits', 'xml'])).status_code == 404
+
+    output = tmp_path / 'deposits.jsonl'
+    call_command('export_history', 'deposits', format='jsonl', player='testuser', output=str(output))
+    deposits = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(deposit['id'], deposit['player']) for deposit in deposits] == [(create_deposit.pk, create_player.pk)]
+
+    out = StringIO()
+    call_command('export_history', 'spins', stdout=out)
+    assert len(out.getvalue().splitlines()) == 1 + 4
+
+
+@pytest.mark.django_db
+def test_activity_feed(client, create_player, django_assert_num_queries):
+    """
+    Tests whether the activity feed merges deposits, bets, wins and achievements sharing
+    timestamps into one newest-first order, walking it forward and back with four bounded
+    queries per page.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from Casino.activity import ActivityFeed
+    from Casino.models import Achievement, Deposit, Player
+
+    now = timezone.now()
+    Deposit.objects.bulk_create([Deposit(player=create_player, amount=index + 1) for index in range(3)])
+    GameResult.objects.bulk_create(
+        [GameResult(player=create_player, stake=2, winnings=index % 2 * 5) for index in range(4)]
+    )
+    Achievement.objects.bulk_create([Achievement(player=create_player, name=f'Achievement {index}') for index in range(2)])
+    GameResult.objects.create(player=Player.objects.create(username='other'), stake=1, winnings=3)
+    for index, model, date_field in [
+        (0, Deposit, 'deposit_date'), (1, GameResult, 'created_at'), (2, Achievement, 'unlocked_date'),
+    ]:
+        for offset, pk in enumerate(model.objects.order_by('pk').values_list('pk', flat=True)):
+            model.objects.filter(pk=pk).update(**{date_field: now - timedelta(seconds=(offset + index) // 2)})
+
+    expected = sorted(
+        [(d.deposit_date, 0, d.pk, 'deposit') for d in Deposit.objects.all()]
+        + [(r.created_at, 1, r.pk, 'bet') for r in GameResult.objects.filter(player=create_player)]
+        + [(r.created_at, 2, r.pk, 'win') for r in GameResult.objects.filter(player=create_player, winnings__gt=0)]
+        + [(a.unlocked_date, 3, a.pk, 'achievement') for a in Achievement.objects.all()],
+        reverse=True,
+    )
+    expected = [(kind, pk) for _, _, pk, kind in expected]
+    assert len(expected) == 11
+
+    feed = ActivityFeed(create_player, page_size=4)
+    with django_assert_num_queries(4):
+        pages = [feed.get_page()]
+    while pages[-1].next_cursor:
+        with django_assert_num_queries(4):
+            pages.append(feed.get_page(pages[-1].next_cursor))
+    assert [[(item.kind, item.pk) for item in page.items] for page in pages] == [
+        expected[:4], expected[4:8], expected[8:],
+    ]
+    assert pages[0].previous_cursor is None and pages[-1].next_cursor is None
+
+    back = feed.get_page(pages[2].previous_cursor)
+    assert [(item.kind, item.pk) for item in back.items] == expected[4:8]
+    back = feed.get_page(back.previous_cursor)
+    assert [(item.kind, item.pk) for item in back.items] == expected[:4] and back.previous_cursor is None
+    assert [(item.kind, item.pk) for item in feed.get_page('bm9wZQ').items] == expected[:4]
+
+    client.force_login(create_player)
+    response = client.get(reverse('activity'))
+    assert len(response.context['activity']) == 11 and b'Achievement 1' in response.content
+    response = client.get(reverse('async-activity'), {'cursor': pages[0].next_cursor})
+    assert [(item.kind, item.pk) for item in response.context['activity']] == expected[4:]
+
+
+@pytest.mark.django_db
+def test_player_daily_stats(client, create_player, settings, tmp_path):
+    """
+    Tests whether spins and deposits upsert the player's daily stats as they happen, whether
+    rebuilding a range of days in parallel chunks recomputes the same rows from the history, and
+    whether the command refuses to rebuild while spins may still be written behind.
+    """
+    from datetime import timedelta
+    from decimal import Decimal
+    from io import StringIO
+    from django.core.management import CommandError, call_command
+    from django.utils import timezone
+    from Casino.models import Deposit, PlayerDailyStats
+    from Casino.rollups import period_stats, rebuild_daily_stats, record_spin_stats
+    from Casino.wallet import deposit
+
+    today = timezone.localdate()
+    client.force_login(create_player)
+    for _ in range(3):
+        client.post(reverse('slot_machine_game'), {'bet': 1, 'lines': 2})
+    deposit(create_player, Decimal(25))
+    deposit(create_player, Decimal(5))
+    yesterday = timezone.now() - timedelta(days=1)
+    record_spin_stats(create_player.pk, Decimal(4), Decimal(30), yesterday)
+    record_spin_stats(create_player.pk, Decimal(4), Decimal(12), yesterday)
+
+    results = GameResult.objects.filter(player=create_player)
+    stats = PlayerDailyStats.objects.get(player=create_player, date=today)
+    assert (stats.spins, stats.stake, stats.deposits) == (3, 6, 30)
+    assert stats.wins == sum(result.winnings for result in results)
+    assert stats.biggest_win == max(result.winnings for result in results)
+    assert period_stats(create_player, today - timedelta(days=6), today) == {
+        'spins': 5, 'stake': 14, 'wins': stats.wins + 42, 'deposits': 30, 'biggest_win': max(stats.biggest_win, 30),
+    }
+    assert period_stats(create_player, today + timedelta(days=1), today + timedelta(days=2))['spins'] == 0
+
+    expected = list(PlayerDailyStats.objects.filter(date=today).values())
+    PlayerDailyStats.objects.filter(date=today).update(spins=99, stake=0)
+    Deposit.objects.filter(pk=Deposit.objects.earliest('pk').pk).update(deposit_date=yesterday)
+    assert rebuild_daily_stats(today - timedelta(days=3), today, chunk_days=1) == 2
+    rebuilt = PlayerDailyStats.objects.get(player=create_player, date=today - timedelta(days=1))
+    assert (rebuilt.spins, rebuilt.deposits) == (0, 25)
+    expected[0]['deposits'] = 5
+    assert [dict(row, id=None) for row in PlayerDailyStats.objects.filter(date=today).values()] == [
+        dict(row, id=None) for row in expected
+    ]
+
+    out = StringIO()
+    call_command('rebuild_daily_stats', today - timedelta(days=1), chunk_days=1, workers=1, stdout=out)
+    assert 'Rebuilt 2 daily stats row(s)' in out.getvalue()
+
+    settings.CASINO_HISTORY_WRITE_BEHIND = True
+    settings.CASINO_HISTORY_SPOOL_DIR = tmp_path
+    with pytest.raises(CommandError, match='written behind'):
+        call_command('rebuild_daily_stats', today, workers=1, stdout=out)
+    (tmp_path / 'history-1-0123456789ab-0.jsonl').write_text('')
+    with pytest.raises(CommandError, match='recover_history'):
+        call_command('rebuild_daily_stats', today, force=True, workers=1, stdout=out)
+    call_command('recover_history', stdout=out)
+    call_command('rebuild_daily_stats', today, force=True, workers=1, stdout=out)
+    assert 'Rebuilt 1 daily stats row(s)' in out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_daily_stats_in_parallel(create_player):
+    """
+    Tests whether rebuilding days in chunks on several worker connections, as the command does
+    by default, recomputes every row while deposits keep upserting theirs, so none is lost or
+    counted twice, and whether rows left without history are deleted.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import timedelta
+    from decimal import Decimal
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connection as default_connection
+    from django.utils import timezone
+    from Casino.models import Player, PlayerDailyStats
+    from Casino.rollups import COUNTERS, rebuild_daily_stats, rebuild_range
+    from Casino.wallet import deposit
+
+    if default_connection.vendor == 'sqlite' and default_connection.is_in_memory_db():
+        pytest.skip('Concurrent writers need a database that makes them wait for locks.')
+
+    now = timezone.now()
+    today = timezone.localdate(now)
+    other = Player.objects.create(username='other')
+    GameResult.objects.bulk_create([
+        GameResult(player=player, stake=2, winnings=days, created_at=now - timedelta(days=days))
+        for days in range(8) for player in (create_player, other)
+    ])
+    PlayerDailyStats.objects.create(player=other, date=today - timedelta(days=9), spins=5)
+    PlayerDailyStats.objects.create(player=create_player, date=today, spins=99)
+
+    def pay(amount):
+        try:
+            deposit(Player.objects.get(pk=create_player.pk), amount)
+        finally:
+            default_connection.close()
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        rebuilt = executor.submit(rebuild_daily_stats, today - timedelta(days=9), today, 1, 4)
+        list(executor.map(pay, [Decimal(5)] * 8))
+    assert rebuilt.result() == 16
+    assert not PlayerDailyStats.objects.filter(date=today - timedelta(days=9)).exists()
+
+    def snapshot():
+        return sorted(PlayerDailyStats.objects.values_list('player', 'date', *COUNTERS, 'biggest_win'))
+
+    rows = snapshot()
+    assert len(rows) == 16
+    stats = PlayerDailyStats.objects.get(player=create_player, date=today)
+    assert (stats.spins, stats.stake, stats.deposits) == (1, 2, 40)
+    rebuild_range(today - timedelta(days=9), today)
+    assert snapshot() == rows
+
+    out = StringIO()
+    call_command('rebuild_daily_stats', today - timedelta(days=9), chunk_days=2, stdout=out)
+    assert 'Rebuilt 16 daily stats row(s)' in out.getvalue() and snapshot() == rows
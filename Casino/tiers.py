@@ -0,0 +1,67 @@
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+
+from .models import Player
+
+TierRule = namedtuple('TierRule', ['status', 'min_experience_points'])
+
+# Tiers by the experience points a player has earned by wagering, lowest first.
+TIER_RULES = (
+    TierRule(1, 0),
+    TierRule(2, 5000),
+    TierRule(3, 50000),
+    TierRule(4, 500000),
+)
+REEVALUATE_BATCH_SIZE = 1000
+
+_thresholds = [rule.min_experience_points for rule in TIER_RULES]
+
+
+def tier_for(experience_points):
+    """Returns the STATUS value a player with ``experience_points`` belongs to."""
+    return TIER_RULES[max(bisect_right(_thresholds, experience_points) - 1, 0)].status
+
+
+def promote(player, gained):
+    """
+    Moves a player whose experience points just grew by ``gained`` into the tier of the new
+    total when that crosses a tier boundary, returning the new status or None.
+
+    Spins that stay inside a tier cost a bisect and no query; players whose status is out of
+    date otherwise are left to ``reevaluate_tiers``. The UPDATE only raises the status, so it
+    cannot undo a concurrent promotion to a higher tier.
+    """
+    status = tier_for(player.experience_points)
+    if status == tier_for(player.experience_points - gained):
+        return None
+    if Player.objects.filter(pk=player.pk, status__lt=status).update(status=status):
+        player.status = status
+        return status
+    return None
+
+
+def reevaluate_tiers(batch_size=REEVALUATE_BATCH_SIZE):
+    """
+    Recomputes the tier of every player, e.g. after the rules change, returning the number of
+    players whose status changed.
+
+    Players are read ``batch_size`` at a time in id order starting after the last id seen, and
+    those in the wrong tier get one ``UPDATE ... WHERE id IN (...)`` per tier and batch.
+    """
+    changed = 0
+    last = 0
+    while True:
+        batch = list(
+            Player.objects.filter(pk__gt=last).order_by('pk')
+            .values_list('pk', 'experience_points', 'status')[:batch_size]
+        )
+        if not batch:
+            return changed
+        moves = defaultdict(list)
+        for pk, experience_points, status in batch:
+            target = tier_for(experience_points)
+            if target != status:
+                moves[target].append(pk)
+        for status, ids in moves.items():
+            changed += Player.objects.filter(pk__in=ids).update(status=status)
+        last = batch[-1][0]
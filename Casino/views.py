@@ -1,15 +1,37 @@
+from collections import namedtuple
+from datetime import timedelta
+
 from django.contrib.auth.models import User
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse_lazy
 from django.views import View
 from .form import PlayerRegistrationForm, PlayerBalanceForm
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
-import random
 from .models import Player, Bet, GameResult, Deposit, Achievement
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from .achievements import unlock_spin_achievements
+from .activity import ActivityFeed
+from .exports import EXPORTS, FORMATS, export_blocks, export_lines
+from .fairness import get_active_seed, rotate_seed, verify_history
+from .history import record_spin
+from .idempotency import idempotent, new_key, settle
+from .machines import DEFAULT_MACHINE, SLOT_MACHINES, get_machine
+from .pagination import KeysetPaginator
+from .rng import spin_random
+from .rollups import period_stats, record_spin_stats
+from .tiers import promote
+from .wallet import InsufficientFunds, WalletError, deposit, settle_spin
+
+SpinOutcome = namedtuple('SpinOutcome', ['grid', 'winnings', 'winning_lines', 'balance', 'message'])
+
+NOT_WHOLE_NUMBERS = 'Bet and lines must be whole numbers!'
 
 
 class CasinoView(View):
@@ -43,6 +65,7 @@ class CustomLogoutView(LogoutView):
     next_page = reverse_lazy('home')
 
 
+@method_decorator(idempotent, name='post')
 class PlayerBalanceUpdateView(UpdateView):
     """View for updating player's balance and handling achievements."""
     model = Player
@@ -53,62 +76,49 @@ class PlayerBalanceUpdateView(UpdateView):
     def get_object(self, queryset=None):
         return self.request.user
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['idempotency_key'] = new_key()
+        # Shown before paying in, so players see what they staked and deposited lately.
+        today = timezone.localdate()
+        context['last_week'] = period_stats(self.request.user, today - timedelta(days=6), today)
+        return context
+
     def form_valid(self, form):
-        player = form.instance
-        previous_balance = Player.objects.get(pk=player.pk).balance
-        new_balance = form.cleaned_data['balance']
-        updated_balance = previous_balance + new_balance
-        player.balance = updated_balance
-        player.save()
-
-        deposit_amount = new_balance
-        Deposit.objects.create(player=player, amount=deposit_amount)
-
-        existing_achievements = player.achievement_set.values_list('name', flat=True)
-
-        if 10000 <= deposit_amount <= 99999 and 'VIP Achievement' not in existing_achievements:
-            Achievement.objects.create(
-                player=player,
-                name="VIP Achievement",
-                description="You've paid between $10,000 and $99,999 at once and unlocked the VIP achievement!",
-            )
-        elif deposit_amount >= 100000 and 'SUPERVIP Achievement' not in existing_achievements:
-            Achievement.objects.create(
-                player=player,
-                name='SUPERVIP Achievement',
-                description="Congratulations! You've paid $100,000 or more at once and unlocked the SUPERVIP achievement!",
-            )
-
-        return super().form_valid(form)
-
-
-MAX_LINES = 3
-MAX_BET = 300
-MIN_BET = 1
-
-ROWS = 3
-COLS = 3
-
-symbol_count = {
-    '$': 2,
-    '!': 4,
-    '#': 6,
-    "@": 8
-}
-
-symbol_value = {
-    '$': 14,
-    '!': 12,
-    '#': 8,
-    "@": 6
-}
+        try:
+            with transaction.atomic():
+                deposit(self.request.user, form.cleaned_data['balance'])
+                settle(self.request)
+        except WalletError as error:
+            form.add_error('balance', str(error))
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
 
 class SlotMachineGameView(View):
-    """View for the slot machine game."""
+    """View for the slot machine games, addressed by their configuration id."""
     template_name = 'slot_machine.html'
 
-    def get(self, request):
+    def get_machine(self, machine_id):
+        try:
+            return get_machine(machine_id)
+        except KeyError:
+            raise Http404(f'Unknown slot machine {machine_id!r}.')
+
+    def get_context(self, machine, **kwargs):
+        config = machine.config
+        return {
+            'machine': config,
+            'machines': SLOT_MACHINES.values(),
+            'MAX_LINES': machine.max_lines,
+            'MIN_BET': config.min_bet,
+            'MAX_BET': config.max_bet,
+            'idempotency_key': new_key(),
+            **kwargs,
+        }
+
+    def get(self, request, machine_id=DEFAULT_MACHINE):
+        machine = self.get_machine(machine_id)
         balance = request.user.balance if request.user.is_authenticated else 0
 
         bet = 10
@@ -117,123 +127,186 @@ class SlotMachineGameView(View):
         winning_lines = []
         show_winning_lines = False
 
-        context = {
-            'balance': balance,
-            'bet': bet,
-            'lines': lines,
-            'message': message,
-            'winning_lines': winning_lines,
-            'MAX_LINES': MAX_LINES,
-            'MIN_BET': MIN_BET,
-            'MAX_BET': MAX_BET,
-        }
+        context = self.get_context(
+            machine,
+            balance=balance,
+            bet=bet,
+            lines=lines,
+            message=message,
+            winning_lines=winning_lines,
+        )
         return render(request, self.template_name, context)
 
-    def post(self, request):
+    def parse_bet(self, request):
+        """Returns the posted bet per line and number of lines, raising ValueError unless they are whole numbers."""
+        return int(request.POST.get('bet', 0)), int(request.POST.get('lines', 0))
+
+    def render_invalid_bet(self, request, machine):
+        """Renders the page again with the validation message of a bet that is not a number."""
+        context = self.get_context(
+            machine,
+            balance=request.user.balance if request.user.is_authenticated else 0,
+            bet=10,
+            lines=1,
+            message=NOT_WHOLE_NUMBERS,
+            winning_lines=[],
+        )
+        return render(request, self.template_name, context)
+
+    @method_decorator(idempotent)
+    def post(self, request, machine_id=DEFAULT_MACHINE):
+        machine = self.get_machine(machine_id)
+        try:
+            bet, lines = self.parse_bet(request)
+        except ValueError:
+            return self.render_invalid_bet(request, machine)
+        outcome = self.play(request, machine, bet, lines)
+
+        context = self.get_context(
+            machine,
+            balance=outcome.balance,
+            bet=bet,
+            lines=lines,
+            message=outcome.message,
+            winning_lines=outcome.winning_lines,
+            show_winning_lines=outcome.winnings > 0,
+        )
+
+        return render(request, self.template_name, context)
+
+    def play(self, request, machine, bet, lines):
+        """Validates, spins and settles one bet of ``bet`` per line on ``lines`` lines."""
+        config = machine.config
         balance = request.user.balance if request.user.is_authenticated else 0
-        bet = int(request.POST.get('bet', 0))
-        lines = int(request.POST.get('lines', 0))
 
         total_bet = bet * lines
-        if total_bet > balance:
+        slots = None
+        winnings = 0
+        winning_lines = []
+        if not (config.min_bet <= bet <= config.max_bet and 1 <= lines <= machine.max_lines):
+            message = f'Bet between {config.min_bet}$ and {config.max_bet}$ on 1 to {machine.max_lines} lines!'
+        elif total_bet > balance:
             message = "You can't bet more than u have!"
-            winnings = 0
-            winning_lines = []
         else:
-            slots = self.get_slot_spin(ROWS, COLS, symbol_count)
-            winnings, winning_lines = self.check_winnings(slots, lines, bet, symbol_value)
+            if request.user.is_authenticated:
+                seed = get_active_seed(request.user)
+                nonce = request.user.nonce
+                slots = self.get_slot_spin(machine, seed.rng(nonce))
+            else:
+                slots = self.get_slot_spin(machine)
+            winnings, winning_lines = self.check_winnings(machine, slots, lines, bet)
             message = f'You won {winnings}$!'
 
-            balance += winnings - total_bet
-
             if request.user.is_authenticated:
-                request.user.balance = balance
-                request.user.save()
-
-                game_result = GameResult.objects.create(
-                    player=request.user,
-                    winnings=winnings,
-                    lines=lines,
-                    bet_per_line=bet,
-                    spin_results=slots
-                )
-                game_result.save()
-
-                Bet.objects.create(player=request.user, amount=total_bet)
-
-        if winnings > 0:
-            show_winning_lines = True
-        else:
-            show_winning_lines = False
-
-        context = {
-            'balance': balance,
-            'bet': bet,
-            'lines': lines,
-            'message': message,
-            'winning_lines': winning_lines,
-            'MAX_LINES': MAX_LINES,
-            'MIN_BET': MIN_BET,
-            'MAX_BET': MAX_BET,
-        }
+                try:
+                    with transaction.atomic():
+                        balance = settle_spin(request.user, total_bet, winnings, seed.id, nonce)
+                        settle(request)
+                        promote(request.user, int(total_bet))
+                        unlock_spin_achievements(request.user, total_bet, winnings)
+                        played_at = timezone.now()
+                        record_spin_stats(request.user.pk, total_bet, winnings, played_at)
+
+                        record_spin(
+                            player_id=request.user.pk,
+                            machine=machine.id,
+                            machine_version=machine.config.version,
+                            stake=total_bet,
+                            winnings=winnings,
+                            lines=lines,
+                            bet_per_line=bet,
+                            spin_code=machine.codec.encode(slots),
+                            server_seed_id=seed.id,
+                            nonce=nonce,
+                            created_at=played_at,
+                        )
+                except WalletError as error:
+                    balance = request.user.balance
+                    slots = None
+                    winnings = 0
+                    winning_lines = []
+                    if isinstance(error, InsufficientFunds):
+                        message = "You can't bet more than u have!"
+                    else:
+                        message = 'Another spin was in progress, try again!'
+            else:
+                balance += winnings - total_bet
 
-        return render(request, self.template_name, context)
+        return SpinOutcome(slots, winnings, winning_lines, balance, message)
 
-    def get_slot_spin(self, rows, cols, symbols):
-        all_symbols = []
-        for symbol, symbol_count in symbols.items():
-            for _ in range(symbol_count):
-                all_symbols.append(symbol)
+    def get_slot_spin(self, machine, rng=spin_random):
+        return machine.spin(rng)
 
-        columns = []
-        for _ in range(cols):
-            column = []
-            current_symbols = all_symbols[:]
-            for _ in range(rows):
-                value = random.choice(current_symbols)
-                current_symbols.remove(value)
-                column.append(value)
+    def check_winnings(self, machine, columns, lines, bet):
+        return machine.engine.paylines.check(columns, lines, bet, machine.config.values)
 
-            columns.append(column)
 
-        return columns
+class SpinApiView(SlotMachineGameView):
+    """
+    JSON endpoint of the slot machine games used by the page's script, returning only the
+    grid, winning lines, win and new balance of a spin instead of the rendered page.
+    """
+    http_method_names = ['post', 'options']
 
-    def check_winnings(self, columns, lines, total_bet, values):
-        winnings = 0
-        winning_lines = []
-        for line in range(lines):
-            symbol = columns[0][line]
-            for column in columns:
-                symbol_to_check = column[line]
-                if symbol != symbol_to_check:
-                    break
-            else:
-                winnings += values[symbol] * total_bet
-                winning_lines.append(line + 1)
-        return winnings, winning_lines
+    @method_decorator(idempotent)
+    def post(self, request, machine_id=DEFAULT_MACHINE):
+        machine = self.get_machine(machine_id)
+        try:
+            bet, lines = self.parse_bet(request)
+        except ValueError:
+            return JsonResponse({'message': NOT_WHOLE_NUMBERS}, status=400)
+        outcome = self.play(request, machine, bet, lines)
+
+        return JsonResponse({
+            'grid': outcome.grid,
+            'winning_lines': outcome.winning_lines,
+            'win': outcome.winnings,
+            'balance': outcome.balance,
+            'message': outcome.message,
+        }, status=200 if outcome.grid is not None else 400)
 
 
 @login_required
 def deposit_history(request):
     """View for displaying deposit history of the logged-in player."""
-    deposits = Deposit.objects.filter(player=request.user).order_by('-deposit_date')
-    return render(request, 'deposit_history.html', {'deposits': deposits})
+    paginator = KeysetPaginator(Deposit.objects.filter(player=request.user), 'deposit_date')
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'deposit_history.html', {'deposits': page.items, 'page': page})
 
 
 @login_required
 def bet_history(request):
     """View for displaying bet history of the logged-in player."""
-    bets = Bet.objects.filter(player=request.user).order_by('-bet_date')
-    return render(request, 'bet_history.html', {'bets': bets})
+    paginator = KeysetPaginator(Bet.objects.filter(player=request.user), 'bet_date')
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'bet_history.html', {'bets': page.items, 'page': page})
 
 
 @login_required
 def winnings_history(request):
     """View for displaying winnings history of the logged-in player."""
-    winnings = GameResult.objects.filter(
+    paginator = KeysetPaginator(GameResult.objects.filter(
         Q(player=request.user) & Q(winnings__gt=0)
-    ).order_by('-created_at')
-    return render(request, 'winnings_history.html', {'winnings': winnings})
+    ), 'created_at')
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'winnings_history.html', {'winnings': page.items, 'page': page})
+
+
+@login_required
+def activity(request):
+    """View for displaying the deposits, bets, wins and achievements of the logged-in player in one feed."""
+    page = ActivityFeed(request.user).get_page(request.GET.get('cursor'))
+    return render(request, 'activity.html', {'activity': page.items, 'page': page})
+
+
+@login_required
+def export_history(request, kind, fmt):
+    """View streaming the deposit, bet or spin history of the logged-in player as CSV or JSON Lines."""
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404(f'Unknown export {kind}.{fmt}.')
+    response = StreamingHttpResponse(export_blocks(export_lines(kind, fmt, request.user)), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{request.user.username}-{kind}.{fmt}"'
+    return response
 
 
 class PlayerDeleteView(LoginRequiredMixin, DeleteView):
@@ -251,6 +324,26 @@ class PlayerDeleteView(LoginRequiredMixin, DeleteView):
         return context
 
 
+@login_required
+def fairness(request):
+    """View for the provably-fair seeds of the logged-in player: rotation, reveals and history verification."""
+    verification = None
+    if request.method == 'POST':
+        if request.POST.get('action') == 'rotate':
+            rotate_seed(request.user, request.POST.get('client_seed', '').strip()[:64] or None)
+        elif request.POST.get('action') == 'verify':
+            verification = verify_history(request.user)
+
+    active_seed = get_active_seed(request.user)
+    revealed_seeds = request.user.server_seeds.filter(revealed_at__isnull=False).order_by('-revealed_at')
+    return render(request, 'fairness.html', {
+        'active_seed': active_seed,
+        'nonce': request.user.nonce,
+        'revealed_seeds': revealed_seeds,
+        'verification': verification,
+    })
+
+
 @login_required
 def achievements(request):
     """View for displaying the achievements of the logged-in player."""
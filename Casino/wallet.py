@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .achievements import unlock_achievements
+from .models import Deposit, Player
+from .rollups import record_deposit_stats
+
+
+class WalletError(Exception):
+    """Base class of wallet operations that could not be applied."""
+
+
+class InsufficientFunds(WalletError):
+    """Raised when the player's balance does not cover the stake."""
+
+
+class StaleNonce(WalletError):
+    """Raised when another spin consumed the provably-fair nonce, or the seed was rotated, first."""
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _column(name):
+    return _quote(Player._meta.get_field(name).column)
+
+
+def _to_decimal(value):
+    field = Player._meta.get_field('balance')
+    return field.to_python(value).quantize(Decimal(1).scaleb(-field.decimal_places))
+
+
+def settle_spin(player, stake, win, seed_id, nonce):
+    """
+    Applies ``balance = balance - stake + win``, advances the player's nonce and updates the
+    player's lifetime counters in one conditional UPDATE, returning the new balance.
+
+    The row is only updated while ``balance >= stake`` and the seed and nonce are still the ones
+    the spin was drawn with, so concurrent spins of one account can neither overdraw it nor lose
+    each other's updates, and the check and the write cost a single round trip. The net result
+    of the spin is added to ``total_winnings`` or ``total_losses``, the stake to
+    ``experience_points``, and ``spin_count`` and ``win_streak`` advance. On failure the current
+    state is read to raise InsufficientFunds or StaleNonce.
+    """
+    balance, nonce_column, pk = _column('balance'), _column('nonce'), _column('id')
+    seed_column = _column('active_seed')
+    winnings, losses, experience = _column('total_winnings'), _column('total_losses'), _column('experience_points')
+    spins, streak = _column('spin_count'), _column('win_streak')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {_quote(Player._meta.db_table)} '
+            f'SET {balance} = {balance} - %s + %s, {nonce_column} = {nonce_column} + 1, '
+            f'{winnings} = {winnings} + %s, {losses} = {losses} + %s, {experience} = {experience} + %s, '
+            f'{spins} = {spins} + 1, {streak} = CASE WHEN %s THEN {streak} + 1 ELSE 0 END '
+            f'WHERE {pk} = %s AND {balance} >= %s AND {seed_column} = %s AND {nonce_column} = %s '
+            f'RETURNING {balance}, {winnings}, {losses}, {experience}, {spins}, {streak}',
+            [stake, win, max(win - stake, 0), max(stake - win, 0), int(stake), win > 0,
+             player.pk, stake, seed_id, nonce],
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        current = Player.objects.values('balance', 'active_seed', 'nonce').get(pk=player.pk)
+        player.balance, player.active_seed_id, player.nonce = (
+            current['balance'], current['active_seed'], current['nonce']
+        )
+        if current['balance'] < stake:
+            raise InsufficientFunds(f'Balance {current["balance"]} does not cover a stake of {stake}.')
+        raise StaleNonce(f'Seed {seed_id} nonce {nonce} was already used.')
+
+    player.balance, player.total_winnings, player.total_losses = (_to_decimal(value) for value in row[:3])
+    player.experience_points, player.spin_count, player.win_streak = row[3:]
+    player.nonce = nonce + 1
+    return player.balance
+
+
+def deposit(player, amount):
+    """
+    Credits ``amount`` to the player's balance and records the Deposit in one transaction,
+    returning the Deposit.
+
+    The balance is incremented in the database and read back with RETURNING, so concurrent
+    deposits and spins never overwrite each other. With the upsert of the player's daily stats
+    the deposit costs three statements, plus two more when it unlocks an achievement.
+    """
+    if amount <= 0:
+        raise WalletError('Deposits must be positive.')
+    balance, pk = _column('balance'), _column('id')
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {_quote(Player._meta.db_table)} SET {balance} = {balance} + %s WHERE {pk} = %s '
+                f'RETURNING {balance}',
+                [amount, player.pk],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Player.DoesNotExist(f'Player {player.pk} does not exist.')
+        record = Deposit.objects.create(player_id=player.pk, amount=amount)
+        record_deposit_stats(player.pk, amount, record.deposit_date)
+        unlock_achievements(player, 'deposit', amount=amount)
+
+    player.balance = _to_decimal(row[0])
+    return record
@@ -123,3 +123,13 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'Casino.Player'
+
+# Spin history
+# With write-behind, GameResult rows are buffered and inserted in batches by a background
+# thread; run `manage.py recover_history` before starting the app after a crash. The spool
+# survives process crashes; set CASINO_HISTORY_FSYNC to also survive OS crashes and power loss,
+# at the cost of a disk sync per spin.
+
+CASINO_HISTORY_WRITE_BEHIND = False
+CASINO_HISTORY_SPOOL_DIR = BASE_DIR / 'spool'
+CASINO_HISTORY_FSYNC = False
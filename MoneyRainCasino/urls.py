@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
+from Casino import async_views
 from Casino.views import CasinoView, PlayerRegistrationView, CustomLoginView, CustomLogoutView, PlayerBalanceUpdateView, \
-    SlotMachineGameView, deposit_history, bet_history, winnings_history, PlayerDeleteView, achievements
+    SlotMachineGameView, deposit_history, bet_history, winnings_history, PlayerDeleteView, achievements, \
+    fairness, SpinApiView, export_history, activity
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,9 +29,23 @@ urlpatterns = [
     path('logout/', CustomLogoutView.as_view(), name='logout'),
     path('add_balance/', PlayerBalanceUpdateView.as_view(), name='balance'),
     path('slot_machine/', SlotMachineGameView.as_view(), name='slot_machine_game'),
+    path('slot_machine/<slug:machine_id>/', SlotMachineGameView.as_view(), name='slot_machine'),
+    path('api/spin', SpinApiView.as_view(), name='api_spin'),
+    path('api/spin/<slug:machine_id>', SpinApiView.as_view(), name='api_spin_machine'),
     path('deposit_history/', deposit_history, name='deposit-history'),
     path('bet_history/', bet_history, name='bet-history'),
     path('winnings_history/', winnings_history, name='win-history'),
     path('delete_account', PlayerDeleteView.as_view(), name='player-delete'),
     path('achievements', achievements, name='achievements'),
+    path('fairness/', fairness, name='fairness'),
+    path('activity/', activity, name='activity'),
+    path('export/<slug:kind>.<slug:fmt>', export_history, name='export'),
+    path('async/slot_machine/', async_views.AsyncSlotMachineGameView.as_view(), name='async-slot_machine_game'),
+    path('async/slot_machine/<slug:machine_id>/', async_views.AsyncSlotMachineGameView.as_view(),
+         name='async-slot_machine'),
+    path('async/deposit_history/', async_views.deposit_history, name='async-deposit-history'),
+    path('async/bet_history/', async_views.bet_history, name='async-bet-history'),
+    path('async/winnings_history/', async_views.winnings_history, name='async-win-history'),
+    path('async/activity/', async_views.activity, name='async-activity'),
+    path('async/achievements', async_views.achievements, name='async-achievements'),
 ]